@@ -2,14 +2,30 @@
 # IMPORTS
 # ============================
 import os
-import json
+import hmac
+import time
 import uuid
 import logging
-from datetime import datetime
-from flask import Flask, render_template, request, send_file, url_for
+from io import BytesIO
+from datetime import datetime, timedelta
+from flask import Flask, g, render_template, request, send_file, url_for, jsonify
+from werkzeug.http import http_date, quote_etag
 
 import renderer_svg
 import renderer_gif
+import glyph_atlas
+import ring_raster
+import fonts
+import metrics
+import render_pool
+import render_budget
+import prerender
+import batch
+import warmup
+from render_cache import RenderCache, FrameStore
+from config_store import ConfigStore
+from countdown_config import CountdownConfig
+import storage
 
 # ============================
 # LOGGING
@@ -48,68 +64,171 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_DIR = os.environ.get("CONFIG_DIR", os.path.join(BASE_DIR, "configs"))
 os.makedirs(CONFIG_DIR, exist_ok=True)
 
-DEFAULT_CONFIG = {
-    "width": 600,
-    "height": 200,
-    "template": "circular",
-
-    # Options communes
-    "background_color": "#FFFFFF",
-    "text_color": "#111111",
-    "font_size": 32,
-    "message_prefix": "Temps restant : ",
-    "target_date": "2025-12-31T23:59:59",
-    "show_labels": True,
-    "loop_duration": 20,
-
-    # Gras
-    "font_bold": False,
-    "label_bold": False,
-    "prefix_bold": False,
-
-    # Template CIRCULAR
-    "circular_base_color": "#E0EAFF",
-    "circular_progress_color": "#4C6FFF",
-    "circular_thickness": 10,
-    "circular_label_uppercase": True,
-    "circular_label_size": 12,
-    "circular_label_color": "#555555",
-    "circular_spacing": 24,
-    "circular_inner_ratio": 0.7,
-
-    # Template BASIC
-    "basic_label_color": "#666666",
-    "basic_label_size": 12,
-    "basic_gap": 4,
-}
+DEFAULT_CONFIG = CountdownConfig()
+
+# Configs parsées en cache (par worker), revalidées par mtime
+CONFIG_STORE = ConfigStore(
+    storage.from_env(CONFIG_DIR),
+    CountdownConfig.parse,
+    ttl=float(os.environ.get("CONFIG_CACHE_TTL", "2")),
+    negative_ttl=float(os.environ.get("CONFIG_CACHE_NEGATIVE_TTL", "5")),
+    max_entries=int(os.environ.get("CONFIG_CACHE_MAX_ENTRIES", "4096")),
+)
+
+# Polices des tailles par défaut chargées une fois au démarrage
+renderer_gif.preload_fonts(DEFAULT_CONFIG)
+
+# Cache des GIF rendus (par worker)
+RENDER_CACHE = RenderCache(
+    max_bytes=int(os.environ.get("RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    max_entries=int(os.environ.get("RENDER_CACHE_MAX_ENTRIES", "512")),
+)
+
+# Frames partagées entre GIF qui se chevauchent (par worker)
+FRAME_STORE = FrameStore(
+    max_countdowns=int(os.environ.get("FRAME_STORE_MAX_COUNTDOWNS", "128")),
+    max_frames=int(os.environ.get("FRAME_STORE_MAX_FRAMES", "120")),
+    max_bytes=int(os.environ.get("FRAME_STORE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+
+# GIF envoyés au fil du rendu (sinon : seulement sur ?stream=1)
+GIF_STREAMING = os.environ.get("GIF_STREAMING", "0") == "1"
+
+# Pool de processus pour les gros GIF (désactivé si RENDER_POOL_WORKERS=0)
+FRAME_POOL = render_pool.from_env(preload_cfg=DEFAULT_CONFIG)
+
+# Rendus lourds limités par worker (cf. render_budget)
+HEAVY_GATE = render_budget.from_env()
+
+# GIF pré-rendus sur disque pour les N countdowns les plus demandés
+# (PRERENDER_HOT=0 : désactivé)
+PRERENDER = prerender.Prerenderer(
+    os.environ.get("PRERENDER_DIR", os.path.join(BASE_DIR, "gif_cache")),
+    load_fn=lambda cid: renderable_config(cid),
+    window_fn=lambda cid, chash: FRAME_STORE.window((cid, chash)),
+    hot=int(os.environ.get("PRERENDER_HOT", "0")),
+    ahead=int(os.environ.get("PRERENDER_AHEAD", "3")),
+    interval=float(os.environ.get("PRERENDER_INTERVAL", "0.5")),
+)
+
+# Rendu par lots (POST /batch, cf. batch.py) ; désactivé sans BATCH_TOKEN
+BATCH_TOKEN = os.environ.get("BATCH_TOKEN", "")
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "5000"))
+BATCH_RENDERER = batch.BatchRenderer(int(os.environ.get("BATCH_WORKERS", "2")))
 
 # ============================
 # OUTILS UTILITAIRES
 # ============================
 
-def cfg_path(cid: str) -> str:
-    return os.path.join(CONFIG_DIR, f"{cid}.json")
+def save_config(cid: str, cfg: CountdownConfig):
+    CONFIG_STORE.save(cid, cfg.to_dict())
 
 
-def save_config(cid: str, cfg: dict):
-    with open(cfg_path(cid), "w", encoding="utf-8") as f:
-        json.dump(cfg, f, indent=2, ensure_ascii=False)
+def load_config(cid: str):
+    return CONFIG_STORE.load(cid)
 
 
-def load_config(cid: str):
-    path = cfg_path(cid)
-    if not os.path.exists(path):
-        return None
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception:
-        return None
-    if not isinstance(data, dict):
-        return None
-    cfg = DEFAULT_CONFIG.copy()
-    cfg.update(data)
-    return cfg
+def renderable_config(cid: str):
+    """
+    Config stockée ramenée dans le budget de rendu ; None si absente ou
+    refusée (RENDER_OVER_BUDGET=reject).
+    """
+    cfg = load_config(cid)
+    return render_budget.fit(cfg) if cfg is not None else None
+
+
+def image_etag(chash: str, start: datetime, version: str) -> str:
+    """
+    ETag déterministe : même config, même seconde, même moteur = même image.
+    """
+    return f"{chash}-{start.strftime('%Y%m%d%H%M%S')}-{version}"
+
+
+def not_modified(etag: str, start: datetime):
+    """
+    Réponse 304 si le client a déjà cette image (If-None-Match), sinon None.
+    Vérifié AVANT tout rendu.
+    """
+    if request.if_none_match.contains(etag):
+        return cache_headers(app.response_class(status=304), etag, start)
+    return None
+
+
+def cache_header_items(etag: str, start: datetime):
+    """
+    Image valable jusqu'à la fin de sa seconde : max-age / s-maxage d'une
+    seconde, Expires calé sur la frontière de seconde suivante.
+    """
+    return [
+        ("ETag", quote_etag(etag)),
+        ("Cache-Control", "public, max-age=1, s-maxage=1"),
+        ("Last-Modified", http_date(start)),
+        ("Expires", http_date(start + timedelta(seconds=1))),
+    ]
+
+
+def cache_headers(resp, etag: str, start: datetime):
+    for name, value in cache_header_items(etag, start):
+        resp.headers[name] = value
+    return resp
+
+
+def gif_job(countdown_id: str, quality: str = None):
+    """
+    Étapes communes (WSGI et ASGI) avant tout rendu : config, qualité
+    forcée, budget, seconde de départ, clés. Renvoie (None, job) ou
+    ((message, statut), None).
+    """
+    with metrics.span("config_load"):
+        cfg = load_config(countdown_id)
+    if cfg is None:
+        return ("Compte introuvable", 404), None
+
+    # Validation date cible
+    end_time = cfg.end_time
+    if end_time is None:
+        return ("Date invalide", 400), None
+
+    # Qualité forcée par requête (?quality=native|2x|4x|auto)
+    if quality in renderer_gif.QUALITY_MODES:
+        cfg = cfg.with_(render_quality=quality)
+
+    # Configs anciennes ou modifiées à la main : budget revérifié ici
+    cfg = render_budget.fit(cfg)
+    if cfg is None:
+        return ("Rendu trop coûteux", 400), None
+
+    # Tous les hits d'une même seconde partagent le même rendu
+    now = datetime.utcnow().replace(microsecond=0)
+    chash = cfg.digest
+    PRERENDER.hit(countdown_id)
+    PRERENDER.ensure_started()
+    return None, {
+        "id": countdown_id,
+        "cfg": cfg,
+        "end_time": end_time,
+        "now": now,
+        "chash": chash,
+        "key": (countdown_id, chash, now.isoformat()),
+        "etag": image_etag(chash, now, renderer_gif.RENDERER_VERSION),
+    }
+
+
+def render_gif_job(job) -> bytes:
+    """
+    Octets du GIF (cache mémoire, sinon rendu unique par clé, sous le
+    sémaphore des rendus lourds).
+    """
+    cfg = job["cfg"]
+    window = FRAME_STORE.window((job["id"], job["chash"]))
+
+    def render():
+        with HEAVY_GATE.admit(cfg):
+            return renderer_gif.generate_gif(
+                cfg, job["end_time"], now=job["now"], frames_window=window, pool=FRAME_POOL
+            ).getvalue()
+
+    return RENDER_CACHE.get_or_render(job["key"], render)
 
 
 def split_target_for_inputs(iso_str: str):
@@ -136,17 +255,13 @@ def parse_bool(val):
 
 @app.route("/", methods=["GET", "POST"])
 def settings():
-    cfg = DEFAULT_CONFIG.copy()
+    cfg = DEFAULT_CONFIG
     img_link = None
+    svg_link = None
 
     if request.method == "POST":
         form = request.form
-
-        # Template
-        tpl = form.get("template") or cfg["template"]
-        if tpl not in ("basic", "circular"):
-            tpl = "basic"
-        cfg["template"] = tpl
+        values = form.to_dict()
 
         # --------- DATE + HEURE SÉPARÉES ----------
         # target_date_only : "2025-12-31"
@@ -158,68 +273,29 @@ def settings():
             # Si l'heure est vide, on force minuit
             if not time_only:
                 time_only = "00:00"
-            iso = f"{date_only}T{time_only}:00"
-            cfg["target_date"] = iso
-        # Si aucune date, on garde la valeur précédente (cfg vient de DEFAULT_CONFIG)
-
-        # Options communes
-        cfg["message_prefix"] = form.get("message_prefix", cfg["message_prefix"])
-        cfg["background_color"] = form.get("background_color", cfg["background_color"])
-        cfg["text_color"] = form.get("text_color", cfg["text_color"])
-
-        try:
-            cfg["font_size"] = int(form.get("font_size", cfg["font_size"]))
-        except Exception:
-            pass
-
-        cfg["show_labels"] = ("show_labels" in form)
-
-        # Gras
-        cfg["font_bold"] = ("font_bold" in form)
-        cfg["label_bold"] = ("label_bold" in form)
-        cfg["prefix_bold"] = ("prefix_bold" in form)
-
-        # CIRCULAR
-        cfg["circular_base_color"] = form.get("circular_base_color", cfg["circular_base_color"])
-        cfg["circular_progress_color"] = form.get("circular_progress_color", cfg["circular_progress_color"])
-        try:
-            cfg["circular_thickness"] = int(form.get("circular_thickness", cfg["circular_thickness"]))
-        except Exception:
-            pass
-        cfg["circular_label_uppercase"] = ("circular_label_uppercase" in form)
-        try:
-            cfg["circular_label_size"] = int(form.get("circular_label_size", cfg["circular_label_size"]))
-        except Exception:
-            pass
-        cfg["circular_label_color"] = form.get("circular_label_color", cfg["circular_label_color"])
-        try:
-            cfg["circular_spacing"] = int(form.get("circular_spacing", cfg["circular_spacing"]))
-        except Exception:
-            pass
-        try:
-            cfg["circular_inner_ratio"] = float(form.get("circular_inner_ratio", cfg["circular_inner_ratio"]))
-        except Exception:
-            pass
-
-        # BASIC
-        cfg["basic_label_color"] = form.get("basic_label_color", cfg["basic_label_color"])
-        try:
-            cfg["basic_label_size"] = int(form.get("basic_label_size", cfg["basic_label_size"]))
-        except Exception:
-            pass
-        try:
-            cfg["basic_gap"] = int(form.get("basic_gap", cfg["basic_gap"]))
-        except Exception:
-            pass
+            values["target_date"] = f"{date_only}T{time_only}:00"
+        # Si aucune date, on garde la valeur par défaut
+
+        # Cases non cochées = absentes du formulaire
+        cfg = CountdownConfig.parse(values, checkboxes=True)
+
+        # Budget de rendu vérifié dès l'enregistrement
+        fitted = render_budget.fit(cfg)
+        if fitted is None:
+            return "Rendu trop coûteux (taille, durée ou qualité)", 400
+        cfg = fitted
 
         # Nouveau countdown → ID
         cid = uuid.uuid4().hex[:8]
         save_config(cid, cfg)
 
         img_link = request.url_root.rstrip("/") + url_for("countdown_image", countdown_id=cid)
+        svg_link = request.url_root.rstrip("/") + url_for(
+            "countdown_svg", countdown_id=cid, v=cfg.digest
+        )
 
     # Valeurs initiales pour les nouveaux champs (date + heure)
-    date_only, time_only = split_target_for_inputs(cfg["target_date"])
+    date_only, time_only = split_target_for_inputs(cfg.target_date)
 
     return render_template(
         "settings.html",
@@ -227,6 +303,7 @@ def settings():
         target_date_only=date_only,
         target_time_only=time_only,
         img_link=img_link,
+        svg_link=svg_link,
     )
 
 
@@ -236,103 +313,19 @@ def settings():
 
 @app.route("/preview.svg")
 def preview_svg():
-    cfg = DEFAULT_CONFIG.copy()
-    q = request.args
-
-    # Template
-    tpl = q.get("template", cfg["template"])
-    if tpl not in ("basic", "circular"):
-        tpl = "basic"
-    cfg["template"] = tpl
-
-    # Commun
-    bg = q.get("background_color")
-    if bg:
-        cfg["background_color"] = bg
-    tc = q.get("text_color")
-    if tc:
-        cfg["text_color"] = tc
-    fs = q.get("font_size")
-    if fs:
-        try:
-            cfg["font_size"] = int(fs)
-        except Exception:
-            pass
-
-    mp = q.get("message_prefix")
-    if mp is not None:
-        cfg["message_prefix"] = mp
-
-    cfg["show_labels"] = parse_bool(q.get("show_labels"))
-
-    # Gras
-    cfg["font_bold"] = parse_bool(q.get("font_bold"))
-    cfg["label_bold"] = parse_bool(q.get("label_bold"))
-    cfg["prefix_bold"] = parse_bool(q.get("prefix_bold"))
-
-    # target_date = string ISO reçue depuis JS (date + heure combinées)
-    td_raw = q.get("target_date")
-    if td_raw:
-        iso = td_raw.replace(" ", "T")
-        if len(iso) == 16:
-            iso += ":00"
-        cfg["target_date"] = iso
-
-    # CIRCULAR
-    cb = q.get("circular_base_color")
-    if cb:
-        cfg["circular_base_color"] = cb
-    cp = q.get("circular_progress_color")
-    if cp:
-        cfg["circular_progress_color"] = cp
-    cth = q.get("circular_thickness")
-    if cth:
-        try:
-            cfg["circular_thickness"] = int(cth)
-        except Exception:
-            pass
-    cfg["circular_label_uppercase"] = parse_bool(q.get("circular_label_uppercase"))
-    cls = q.get("circular_label_size")
-    if cls:
-        try:
-            cfg["circular_label_size"] = int(cls)
-        except Exception:
-            pass
-    clc = q.get("circular_label_color")
-    if clc:
-        cfg["circular_label_color"] = clc
-    csp = q.get("circular_spacing")
-    if csp:
-        try:
-            cfg["circular_spacing"] = int(csp)
-        except Exception:
-            pass
-    cir = q.get("circular_inner_ratio")
-    if cir:
-        try:
-            cfg["circular_inner_ratio"] = float(cir)
-        except Exception:
-            pass
-
-    # BASIC
-    blc = q.get("basic_label_color")
-    if blc:
-        cfg["basic_label_color"] = blc
-    bls = q.get("basic_label_size")
-    if bls:
-        try:
-            cfg["basic_label_size"] = int(bls)
-        except Exception:
-            pass
-    bgap = q.get("basic_gap")
-    if bgap:
-        try:
-            cfg["basic_gap"] = int(bgap)
-        except Exception:
-            pass
-
-    svg_str = renderer_svg.svg_preview(cfg)
-    return app.response_class(svg_str, mimetype="image/svg+xml")
+    # Même parseur que le formulaire (cases décochées envoyées à "0")
+    cfg = CountdownConfig.parse(request.args, checkboxes=True)
+
+    now = datetime.utcnow().replace(microsecond=0)
+    etag = image_etag(cfg.digest, now, renderer_svg.RENDERER_VERSION)
+    resp = not_modified(etag, now)
+    if resp is not None:
+        return resp
+
+    svg_str = renderer_svg.svg_preview(cfg, now=now)
+    return cache_headers(
+        app.response_class(svg_str, mimetype="image/svg+xml"), etag, now
+    )
 
 
 # ============================
@@ -341,18 +334,236 @@ def preview_svg():
 
 @app.route("/c/<countdown_id>.gif")
 def countdown_image(countdown_id):
+    error, job = gif_job(countdown_id, request.args.get("quality"))
+    if error is not None:
+        return error
+
+    now, etag = job["now"], job["etag"]
+    resp = not_modified(etag, now)
+    if resp is not None:
+        return resp
+
+    # Countdown chaud : GIF déjà sur disque, aucun rendu
+    cached = PRERENDER.lookup(countdown_id, job["chash"], now)
+    if cached is not None:
+        return cache_headers(send_file(cached, mimetype="image/gif"), etag, now)
+
+    if GIF_STREAMING or parse_bool(request.args.get("stream")):
+        chunks = _stream_gif(job)
+        resp = app.response_class(_count_bytes(chunks), mimetype="image/gif")
+        if hasattr(chunks, "close"):
+            resp.call_on_close(chunks.close)
+        return cache_headers(resp, etag, now)
+
+    data = render_gif_job(job)
+    return cache_headers(send_file(BytesIO(data), mimetype="image/gif"), etag, now)
+
+
+@app.errorhandler(render_budget.RenderBusy)
+def render_busy(_err):
+    resp = app.response_class("Trop de rendus en cours, réessayez", status=503)
+    resp.headers["Retry-After"] = "1"
+    return resp
+
+
+# ============================
+# SVG AUTONOME (décompte côté client)
+# ============================
+
+@app.route("/c/<countdown_id>.svg")
+def countdown_svg(countdown_id):
     cfg = load_config(countdown_id)
     if cfg is None:
         return "Compte introuvable", 404
 
-    # Validation date cible
-    try:
-        end_time = datetime.fromisoformat(cfg["target_date"])
-    except Exception:
+    end_time = cfg.end_time
+    if end_time is None:
         return "Date invalide", 400
 
-    buf = renderer_gif.generate_gif(cfg, end_time)
-    return send_file(buf, mimetype="image/gif")
+    # Ne dépend pas de l'heure : une version par config
+    chash = cfg.digest
+    etag = f"{chash}-svg{renderer_svg.RENDERER_VERSION}"
+
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    else:
+        resp = app.response_class(
+            renderer_svg.svg_live(cfg, end_time), mimetype="image/svg+xml"
+        )
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    if request.args.get("v") == chash:
+        # URL versionnée (?v=<hash>) : une modif de config change l'URL
+        resp.cache_control.max_age = 31536000
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    return resp
+
+
+def _stream_gif(job):
+    """
+    Octets du GIF au fil du rendu : l'en-tête dès la 1re frame, puis
+    chaque frame.
+    Un seul rendu par clé (cf. RenderCache.stream) : les requêtes
+    concurrentes de la même seconde relaient le flux du premier ; le
+    jeton des rendus lourds n'est pris que par celui-ci.
+    """
+    cfg = job["cfg"]
+    window = FRAME_STORE.window((job["id"], job["chash"]))
+
+    def admit():
+        # Jeton rendu à la fin de l'envoi (ou à la déconnexion)
+        return HEAVY_GATE.release if HEAVY_GATE.acquire(cfg) else None
+
+    return RENDER_CACHE.stream(
+        job["key"],
+        lambda: renderer_gif.iter_gif(cfg, job["end_time"], now=job["now"], frames_window=window),
+        admit=admit,
+    )
+
+
+def _count_bytes(chunks):
+    # Octets réellement envoyés (content_length inconnu en streaming)
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        metrics.inc("countdown_http_response_bytes_total", sent, endpoint="countdown_image")
+
+
+# ============================
+# RENDU PAR LOTS
+# ============================
+
+@app.route("/batch", methods=["POST"])
+def batch_render():
+    """
+    Corps JSON : {"ids": [...], "at": ISO} (plusieurs countdowns), ou
+    {"id": ..., "at": [ISO, ...]} et/ou {"id": ..., "start": ISO,
+    "count": N, "step": S} (un countdown, plusieurs instants).
+    Réponse : archive ?format=zip (défaut) ou tar, en streaming.
+    """
+    if not BATCH_TOKEN:
+        return "Introuvable", 404
+    auth = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(auth.encode("utf-8"), f"Bearer {BATCH_TOKEN}".encode("utf-8")):
+        return "Non autorisé", 401
+
+    fmt = request.args.get("format", "zip")
+    body = request.get_json(silent=True)
+    if fmt not in batch.ARCHIVES or not isinstance(body, dict):
+        return "Requête invalide", 400
+
+    try:
+        if "ids" in body:
+            # Une chaîne serait itérée caractère par caractère
+            if not isinstance(body["ids"], list):
+                raise TypeError(body["ids"])
+            ids = [str(cid) for cid in body["ids"]]
+            at = body.get("at")
+            if at and not isinstance(at, str):
+                raise TypeError(at)
+            starts = batch.starts_for([at] if at else [])
+        else:
+            ids = [str(body["id"])]
+            at = body.get("at") or []
+            count = int(body.get("count", 1))
+            step = int(body.get("step", 1))
+            if not 0 < count <= BATCH_MAX_ITEMS:
+                raise ValueError(count)
+            if step < 1:
+                raise ValueError(step)
+            start = body.get("start")
+            if start is not None and not isinstance(start, str):
+                raise TypeError(start)
+            starts = batch.starts_for(_str_list(at), start, count, step)
+    except (KeyError, TypeError, ValueError):
+        return "Requête invalide", 400
+
+    if len(ids) * len(starts) > BATCH_MAX_ITEMS:
+        return f"Lot trop gros (max {BATCH_MAX_ITEMS} GIF)", 400
+
+    groups, errors = batch.plan(renderable_config, ids, starts)
+    resp = app.response_class(
+        batch.stream(BATCH_RENDERER, groups, errors, fmt), mimetype=batch.MIMETYPES[fmt]
+    )
+    resp.headers["Content-Disposition"] = f'attachment; filename="countdowns.{fmt}"'
+    return resp
+
+
+def _str_list(value):
+    # Instant(s) ISO du corps JSON : une chaîne ou une liste de chaînes
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise TypeError(value)
+    return value
+
+
+# ============================
+# MÉTRIQUES
+# ============================
+
+@app.before_request
+def _metrics_start():
+    g.metrics_t0 = time.perf_counter()
+
+
+@app.after_request
+def _metrics_record(resp):
+    t0 = g.pop("metrics_t0", None)
+    endpoint = request.endpoint or "other"
+    metrics.inc("countdown_http_requests_total", endpoint=endpoint, status=str(resp.status_code))
+    if t0 is not None:
+        metrics.observe("countdown_http_request_seconds", time.perf_counter() - t0, endpoint=endpoint)
+    # Flux GIF sans longueur connue : octets comptés par le générateur
+    if resp.content_length:
+        metrics.inc("countdown_http_response_bytes_total", resp.content_length, endpoint=endpoint)
+    metrics.REGISTRY.maybe_flush()
+    return resp
+
+
+def _cache_counters():
+    out = []
+    for layer, stats in (
+        ("render", RENDER_CACHE.stats()),
+        ("frames", FRAME_STORE.stats()),
+        ("glyphs", glyph_atlas.ATLAS.stats()),
+        ("configs", CONFIG_STORE.stats()),
+        ("svg", renderer_svg.stats()),
+    ):
+        out.append(("countdown_cache_hits_total", {"layer": layer}, stats["hits"]))
+        out.append(("countdown_cache_misses_total", {"layer": layer}, stats["misses"]))
+    out.append(("countdown_cache_hits_total", {"layer": "prerender"}, PRERENDER.served))
+    return out
+
+
+metrics.REGISTRY.add_collector(_cache_counters)
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return app.response_class(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/stats/cache")
+def cache_stats():
+    return jsonify(
+        render=RENDER_CACHE.stats(),
+        frames=FRAME_STORE.stats(),
+        glyphs=glyph_atlas.ATLAS.stats(),
+        fonts=fonts.stats(),
+        pool=FRAME_POOL.stats() if FRAME_POOL else None,
+        configs=CONFIG_STORE.stats(),
+        prerender=PRERENDER.stats(),
+        svg=renderer_svg.stats(),
+        rings=ring_raster.stats(),
+        budget=HEAVY_GATE.stats(),
+        warmup=warmup.stats(),
+    )
 
 
 # ============================
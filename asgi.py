@@ -0,0 +1,263 @@
+"""
+Mode ASGI : les endpoints image tournent sur une boucle d'événements.
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \\
+        gunicorn -c gunicorn.conf.py asgi:application
+
+(uvicorn à installer à part.) Les envois lents (proxies d'emails) et les
+hits de cache sont servis par la boucle ; seuls les rendus occupent un
+thread, dans un pool borné (ASGI_RENDER_THREADS). Au-delà de
+ASGI_RENDER_QUEUE rendus en attente : 503 + Retry-After. Les autres
+routes (réglages, stats, SVG autonome, GIF en streaming...) passent par
+l'app Flask dans un thread, corps relayé morceau par morceau.
+"""
+import os
+import re
+import sys
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import parse_qsl
+
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_etags
+
+import app as flask_app
+import metrics
+import render_budget
+import renderer_svg
+from countdown_config import CountdownConfig
+
+RENDER_THREADS = int(os.environ.get("ASGI_RENDER_THREADS", "2"))
+RENDER_QUEUE = int(os.environ.get("ASGI_RENDER_QUEUE", "32"))
+IO_THREADS = int(os.environ.get("ASGI_IO_THREADS", "8"))
+SEND_CHUNK = 64 * 1024
+
+_GIF_PATH = re.compile(r"^/c/([^/]+)\.gif$")
+
+# Pools séparés : un rendu long ne bloque pas les lectures de config
+# ni les requêtes Flask.
+_render_executor = ThreadPoolExecutor(RENDER_THREADS, thread_name_prefix="asgi-render")
+_io_executor = ThreadPoolExecutor(IO_THREADS, thread_name_prefix="asgi-io")
+_render_slots = None  # asyncio.Semaphore, créé dans la boucle
+
+
+# ============================
+# ENVOI
+# ============================
+
+async def _respond(send, status, body=b"", content_type="text/plain; charset=utf-8", headers=()):
+    raw = [(b"content-type", content_type.encode("latin-1")),
+           (b"content-length", str(len(body)).encode("latin-1"))]
+    raw += [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+    await send({"type": "http.response.start", "status": status, "headers": raw})
+    # Par morceaux : le serveur applique la contre-pression des clients lents
+    view = memoryview(body)
+    for i in range(0, max(len(body), 1), SEND_CHUNK):
+        chunk = bytes(view[i:i + SEND_CHUNK])
+        await send({"type": "http.response.body", "body": chunk,
+                    "more_body": i + SEND_CHUNK < len(body)})
+
+
+def _record(endpoint, status, t0, size):
+    metrics.inc("countdown_http_requests_total", endpoint=endpoint, status=str(status))
+    metrics.observe("countdown_http_request_seconds", time.perf_counter() - t0, endpoint=endpoint)
+    if size:
+        metrics.inc("countdown_http_response_bytes_total", size, endpoint=endpoint)
+    metrics.REGISTRY.maybe_flush()
+
+
+def _header(scope, name: bytes):
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+# ============================
+# ENDPOINTS IMAGE
+# ============================
+
+async def _countdown_image(scope, send, countdown_id):
+    t0 = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    args = MultiDict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+
+    # Config : en mémoire en régime établi, mais peut toucher le stockage
+    error, job = await loop.run_in_executor(
+        _io_executor, flask_app.gif_job, countdown_id, args.get("quality")
+    )
+    if error is not None:
+        message, status = error
+        await _respond(send, status, message.encode("utf-8"))
+        return _record("countdown_image", status, t0, 0)
+
+    headers = flask_app.cache_header_items(job["etag"], job["now"])
+    if parse_etags(_header(scope, b"if-none-match")).contains(job["etag"]):
+        await _respond(send, 304, headers=headers)
+        return _record("countdown_image", 304, t0, 0)
+
+    # Échec compté par get_or_render (render_gif_job), pas ici
+    data = flask_app.RENDER_CACHE.peek(job["key"])
+    if data is None:
+        cached = flask_app.PRERENDER.lookup(countdown_id, job["chash"], job["now"])
+        if cached is not None:
+            with cached:
+                data = await loop.run_in_executor(_io_executor, cached.read)
+
+    if data is None:
+        if _render_slots.locked():
+            await _respond(send, 503, "Trop de rendus en cours, réessayez".encode("utf-8"),
+                           headers=[("Retry-After", "1")])
+            return _record("countdown_image", 503, t0, 0)
+        async with _render_slots:
+            try:
+                data = await loop.run_in_executor(
+                    _render_executor, flask_app.render_gif_job, job
+                )
+            except render_budget.RenderBusy:
+                await _respond(send, 503, "Trop de rendus en cours, réessayez".encode("utf-8"),
+                               headers=[("Retry-After", "1")])
+                return _record("countdown_image", 503, t0, 0)
+
+    await _respond(send, 200, data, "image/gif", headers)
+    _record("countdown_image", 200, t0, len(data))
+
+
+async def _preview_svg(scope, send):
+    # Squelette mémorisé : moins d'une ms, rendu directement dans la boucle
+    t0 = time.perf_counter()
+    args = MultiDict(parse_qsl(scope.get("query_string", b"").decode("latin-1"),
+                               keep_blank_values=True))
+    cfg = CountdownConfig.parse(args, checkboxes=True)
+    now = flask_app.datetime.utcnow().replace(microsecond=0)
+    etag = flask_app.image_etag(cfg.digest, now, renderer_svg.RENDERER_VERSION)
+    headers = flask_app.cache_header_items(etag, now)
+
+    if parse_etags(_header(scope, b"if-none-match")).contains(etag):
+        await _respond(send, 304, headers=headers)
+        return _record("preview_svg", 304, t0, 0)
+
+    body = renderer_svg.svg_preview(cfg, now=now).encode("utf-8")
+    await _respond(send, 200, body, "image/svg+xml; charset=utf-8", headers)
+    _record("preview_svg", 200, t0, len(body))
+
+
+# ============================
+# PONT WSGI (autres routes)
+# ============================
+
+async def _wsgi(scope, receive, send):
+    body = BytesIO()
+    while True:
+        message = await receive()
+        body.write(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    body.seek(0)
+
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for key, value in scope.get("headers", ()):
+        name = key.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name == "CONTENT_LENGTH":
+            environ["CONTENT_LENGTH"] = value
+        else:
+            http_name = f"HTTP_{name}"
+            environ[http_name] = f"{environ[http_name]},{value}" if http_name in environ else value
+
+    status_headers = {}
+
+    def start_response(status, headers, exc_info=None):
+        status_headers["status"] = int(status.split(" ", 1)[0])
+        status_headers["headers"] = headers
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(_io_executor, flask_app.app, environ, start_response)
+    chunks = iter(result)
+    done = object()
+    started = False
+    try:
+        # Corps relayé morceau par morceau (/batch, ?stream=1) : chaque
+        # next() peut rendre une frame, il tourne hors de la boucle
+        while True:
+            chunk = await loop.run_in_executor(_io_executor, next, chunks, done)
+            if not started:
+                # start_response est appelé au plus tard au premier morceau
+                raw = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in status_headers["headers"]]
+                await send({"type": "http.response.start", "status": status_headers["status"], "headers": raw})
+                started = True
+            if chunk is done:
+                break
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+    finally:
+        if hasattr(result, "close"):
+            await loop.run_in_executor(_io_executor, result.close)
+
+
+# ============================
+# APPLICATION ASGI
+# ============================
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _render_executor.shutdown(wait=False, cancel_futures=True)
+            _io_executor.shutdown(wait=False, cancel_futures=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def _streamed(scope) -> bool:
+    # GIF en streaming (frame par frame) : chemin Flask, relayé par _wsgi
+    if flask_app.GIF_STREAMING:
+        return True
+    args = MultiDict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+    return flask_app.parse_bool(args.get("stream"))
+
+
+async def application(scope, receive, send):
+    global _render_slots
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    if _render_slots is None:
+        # Rendus en cours + en attente d'un thread de rendu
+        _render_slots = asyncio.Semaphore(RENDER_THREADS + RENDER_QUEUE)
+
+    path = scope["path"]
+    if scope["method"] in ("GET", "HEAD"):
+        match = _GIF_PATH.match(path)
+        if match and not _streamed(scope):
+            return await _countdown_image(scope, send, match.group(1))
+        if path == "/preview.svg":
+            return await _preview_svg(scope, send)
+    return await _wsgi(scope, receive, send)
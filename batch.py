@@ -0,0 +1,373 @@
+"""
+Rendu par lots : beaucoup de countdowns, ou un countdown à beaucoup
+d'instants de départ (pré-remplissage d'un CDN avant une campagne).
+
+    python batch.py ids a1 b2 c3 --zip gifs.zip
+    python batch.py ids --ids-file ids.txt --out gifs/
+    python batch.py times a1 --start 2025-12-01T09:00:00 --count 3600 --tar gifs.tar
+    python batch.py times a1 --at 2025-12-01T09:00:00 2025-12-01T10:00:00 --out gifs/
+
+Fichiers produits : <id>-<AAAAMMJJHHMMSS>.gif + manifest.json (éléments
+rendus et erreurs). Même endpoint côté web : POST /batch (cf. app.py).
+"""
+import os
+import re
+import sys
+import json
+import time
+import tarfile
+import zipfile
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+
+import renderer_gif
+from countdown_config import CountdownConfig
+from render_cache import FrameWindow
+
+
+# ============================
+# PLAN ET RENDU
+# ============================
+# Les instants d'un même countdown sont rendus dans l'ordre, dans la même
+# tâche, avec une FrameWindow commune : deux GIF à une seconde d'écart
+# partagent loop_duration-1 frames. Les tâches sont réparties sur un pool
+# de processus (spawn) dont chaque process garde polices, couches
+# statiques, palettes et tuiles d'un élément à l'autre.
+
+# Instants par tâche (un countdown à 3600 instants = plusieurs tâches)
+BATCH_CHUNK = int(os.environ.get("BATCH_CHUNK", "32"))
+
+# Les ids deviennent des noms de fichiers
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def item_name(cid: str, start: datetime) -> str:
+    return f"{cid}-{start.strftime('%Y%m%d%H%M%S')}.gif"
+
+
+def plan(load_fn, ids, starts):
+    """
+    Groupes (cid, cfg, fin, [instants]) à rendre et erreurs {cid: message}.
+    `load_fn(cid)` renvoie la config (déjà ramenée dans le budget) ou None.
+    Chaque id est rendu à chacun des `starts`.
+    """
+    groups, errors = [], {}
+    starts = sorted(set(starts))
+    for cid in dict.fromkeys(ids):
+        if not _SAFE_ID.match(cid):
+            errors[cid] = "Id invalide"
+            continue
+        cfg = load_fn(cid)
+        if cfg is None:
+            errors[cid] = "Compte introuvable"
+            continue
+        end_time = cfg.end_time
+        if end_time is None:
+            errors[cid] = "Date invalide"
+            continue
+        for i in range(0, len(starts), BATCH_CHUNK):
+            groups.append((cid, cfg, end_time, starts[i:i + BATCH_CHUNK]))
+    return groups, errors
+
+
+def _init_worker():
+    renderer_gif.preload_fonts(CountdownConfig())
+
+
+def _render_group(cid: str, cfg: CountdownConfig, end_time: datetime, starts) -> list:
+    window = FrameWindow(max_frames=2 * cfg.loop_duration)
+    return [
+        (
+            item_name(cid, start),
+            renderer_gif.generate_gif(cfg, end_time, now=start, frames_window=window).getvalue(),
+        )
+        for start in starts
+    ]
+
+
+class BatchRenderer:
+    """
+    Pool de processus pour les lots (créé au premier lot). workers <= 1 :
+    rendu dans le thread appelant.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def run(self, groups):
+        """
+        Itère sur (nom, octets) au fil des tâches terminées. Au plus
+        2 x workers tâches en vol : la mémoire reste bornée quelle que
+        soit la taille du lot.
+        """
+        if self.workers <= 1:
+            for group in groups:
+                yield from _render_group(*group)
+            return
+
+        executor = self._get_executor()
+        todo = iter(groups)
+        pending = set()
+        try:
+            while True:
+                for group in todo:
+                    pending.add(executor.submit(_render_group, *group))
+                    if len(pending) >= 2 * self.workers:
+                        break
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# ============================
+# SORTIES (dossier, tar, zip)
+# ============================
+
+class DirWriter:
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def add(self, name: str, data: bytes):
+        tmp = os.path.join(self.path, f".{name}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(self.path, name))
+
+    def close(self):
+        pass
+
+
+class TarWriter:
+
+    def __init__(self, fileobj):
+        # "w|" : écriture en flux, sans seek (fichier ou réponse HTTP)
+        self._tar = tarfile.open(fileobj=fileobj, mode="w|")
+        self._mtime = time.time()
+
+    def add(self, name: str, data: bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = self._mtime
+        self._tar.addfile(info, _Reader(data))
+
+    def close(self):
+        self._tar.close()
+
+
+class ZipWriter:
+
+    def __init__(self, fileobj):
+        # GIF déjà compressés (LZW) : stockés tels quels
+        self._zip = zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_STORED)
+
+    def add(self, name: str, data: bytes):
+        self._zip.writestr(name, data)
+
+    def close(self):
+        self._zip.close()
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self._data = memoryview(data)
+        self._pos = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._data) if size < 0 else self._pos + size
+        out = bytes(self._data[self._pos:end])
+        self._pos += len(out)
+        return out
+
+
+class _Chunks:
+    """
+    Fichier en écriture seule dont on vide les morceaux au fil de l'eau
+    (corps de réponse HTTP en streaming).
+    """
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts = []
+        return out
+
+
+ARCHIVES = {"tar": TarWriter, "zip": ZipWriter}
+MIMETYPES = {"tar": "application/x-tar", "zip": "application/zip"}
+
+
+def _manifest(items, errors) -> bytes:
+    return json.dumps({"items": items, "errors": errors}, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def write(renderer: BatchRenderer, groups, errors, writer) -> dict:
+    """
+    Rend le lot dans `writer` (+ manifest.json) et renvoie le manifeste.
+    """
+    items = []
+    try:
+        for name, data in renderer.run(groups):
+            writer.add(name, data)
+            items.append(name)
+        writer.add("manifest.json", _manifest(items, errors))
+    finally:
+        writer.close()
+    return {"items": items, "errors": errors}
+
+
+def stream(renderer: BatchRenderer, groups, errors, fmt: str = "zip"):
+    """
+    Archive tar/zip produite morceau par morceau (un par GIF rendu).
+    """
+    out = _Chunks()
+    writer = ARCHIVES[fmt](out)
+    items = []
+    for name, data in renderer.run(groups):
+        writer.add(name, data)
+        items.append(name)
+        yield out.drain()
+    writer.add("manifest.json", _manifest(items, errors))
+    writer.close()
+    yield out.drain()
+
+
+def parse_start(value: str) -> datetime:
+    """
+    Instant ISO (UTC, naïf), ramené à la seconde.
+    """
+    return datetime.fromisoformat(value.strip().replace(" ", "T")).replace(microsecond=0)
+
+
+def time_range(start: datetime, count: int, step: int):
+    if step < 1:
+        # step <= 0 : le même instant répété, ou une série à rebours
+        raise ValueError(f"step doit être >= 1 (reçu {step})")
+    return [start + timedelta(seconds=i * step) for i in range(count)]
+
+
+def starts_for(at=(), start: str = None, count: int = 1, step: int = 1, now: datetime = None):
+    """
+    Instants de départ : liste explicite `at` + série `start`, `count`,
+    `step` ; à défaut la seconde courante.
+    """
+    starts = [parse_start(value) for value in at]
+    if start:
+        starts += time_range(parse_start(start), count, step)
+    return starts or [now or datetime.utcnow().replace(microsecond=0)]
+
+
+# ============================
+# CLI
+# ============================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rendu de GIF par lots")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_ids = sub.add_parser("ids", help="plusieurs countdowns, même instant")
+    p_ids.add_argument("ids", nargs="*", help="ids des countdowns")
+    p_ids.add_argument("--ids-file", help="fichier d'ids (un par ligne, - = stdin)")
+    p_ids.add_argument("--at", help="instant de départ ISO UTC (défaut : maintenant)")
+
+    p_times = sub.add_parser("times", help="un countdown, plusieurs instants")
+    p_times.add_argument("id", help="id du countdown")
+    p_times.add_argument("--at", nargs="+", default=[], help="instants ISO UTC")
+    p_times.add_argument("--start", help="premier instant ISO UTC (avec --count)")
+    p_times.add_argument("--count", type=int, default=1, help="nombre d'instants")
+    p_times.add_argument("--step", type=int, default=1, help="écart en secondes")
+
+    for p in (p_ids, p_times):
+        out = p.add_mutually_exclusive_group(required=True)
+        out.add_argument("--out", help="dossier de sortie")
+        out.add_argument("--tar", help="archive tar (- = stdout)")
+        out.add_argument("--zip", help="archive zip")
+        p.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                       help="processus de rendu (1 = séquentiel)")
+
+    args = parser.parse_args(argv)
+    if args.cmd == "times" and args.step < 1:
+        parser.error("--step doit être >= 1")
+
+    if args.cmd == "ids":
+        ids = list(args.ids)
+        if args.ids_file:
+            f = sys.stdin if args.ids_file == "-" else open(args.ids_file, encoding="utf-8")
+            with f:
+                ids += [line.strip() for line in f if line.strip()]
+        starts = starts_for([args.at] if args.at else [])
+    else:
+        ids = [args.id]
+        starts = starts_for(args.at, args.start, args.count, args.step)
+    if not ids:
+        parser.error("aucun id")
+
+    # Configs lues comme le serveur (CONFIG_DIR, STORAGE_BACKEND, budget)
+    import app as web
+    groups, errors = plan(web.renderable_config, ids, starts)
+
+    if args.out:
+        writer = DirWriter(args.out)
+        target = None
+    else:
+        path = args.tar or args.zip
+        target = sys.stdout.buffer if path == "-" else open(path, "wb")
+        writer = (TarWriter if args.tar else ZipWriter)(target)
+
+    renderer = BatchRenderer(args.workers)
+    t0 = time.perf_counter()
+    try:
+        result = write(renderer, groups, errors, writer)
+    finally:
+        renderer.shutdown()
+        if target is not None and target is not sys.stdout.buffer:
+            target.close()
+
+    print(
+        f"{len(result['items'])} GIF en {time.perf_counter() - t0:.1f} s, "
+        f"{len(errors)} erreur(s)",
+        file=sys.stderr,
+    )
+    for cid, message in errors.items():
+        print(f"  {cid} : {message}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
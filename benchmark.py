@@ -0,0 +1,533 @@
+"""
+Benchmarks hors-ligne du rendu.
+
+    python benchmark.py quality            # coût / qualité (PSNR) des modes de rendu
+    python benchmark.py encode             # encodage GIF : palette adaptative vs globale, delta
+    python benchmark.py palette            # couleurs de la config restituées au bit près
+                                           # (code 1 sinon)
+    python benchmark.py storage --sizes 10000 100000 1000000
+                                           # latence de lecture par backend de stockage
+    python benchmark.py render             # matrice templates x tailles x durées x options
+                                           # (temps/frame, encodage, octets, RSS, pic par GIF)
+    python benchmark.py pool --workers 2 4 # un GIF seul : séquentiel vs pool de frames
+
+    python benchmark.py --save base.json render      # enregistre une référence
+    python benchmark.py --baseline base.json render  # compare (code 1 si régression)
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import itertools
+import tracemalloc
+import multiprocessing
+from io import BytesIO
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageChops, ImageStat
+
+import gif_palette
+import render_pool
+import renderer_gif
+import renderer_svg
+import storage
+from countdown_config import CountdownConfig
+
+
+# Config de référence (= DEFAULT_CONFIG de app.py, sans importer Flask)
+BASE_CONFIG = CountdownConfig()
+
+# Quelques valeurs de "secondes restantes" représentatives
+SAMPLE_REMAINING = [86400 * 3 + 3600 * 5 + 60 * 17 + s for s in range(0, 60, 3)]
+
+
+def psnr(a, b) -> float:
+    """
+    PSNR (dB) entre deux images RGB de même taille. inf si identiques.
+    """
+    diff = ImageChops.difference(a.convert("RGB"), b.convert("RGB"))
+    mse = sum(v * v for v in ImageStat.Stat(diff).rms) / 3
+    if mse == 0:
+        return math.inf
+    return 10 * math.log10(255 * 255 / mse)
+
+
+def bench_quality(templates, modes):
+    results = []
+    for tpl in templates:
+        ref_cfg = BASE_CONFIG.with_(template=tpl, render_quality="4x")
+        refs = [renderer_gif.render_frame(ref_cfg, r) for r in SAMPLE_REMAINING]
+
+        for mode in modes:
+            cfg = BASE_CONFIG.with_(template=tpl, render_quality=mode)
+            renderer_gif.render_frame(cfg, SAMPLE_REMAINING[0])  # chauffe (couches, polices)
+
+            t0 = time.perf_counter()
+            frames = [renderer_gif.render_frame(cfg, r) for r in SAMPLE_REMAINING]
+            elapsed = time.perf_counter() - t0
+
+            scores = [psnr(ref, f) for ref, f in zip(refs, frames)]
+            results.append({
+                "template": tpl,
+                "quality": mode,
+                "ms_per_frame": round(elapsed * 1000 / len(frames), 3),
+                "psnr_db_min": round(min(scores), 2),
+                "psnr_db_mean": round(sum(scores) / len(scores), 2),
+            })
+    return results
+
+
+def _encode_adaptive(rgb_frames) -> bytes:
+    # Ancien chemin : chaque frame quantifiée indépendamment par l'encodeur
+    buf = BytesIO()
+    rgb_frames[0].save(
+        buf, format="GIF", save_all=True, append_images=rgb_frames[1:],
+        duration=1000, loop=0,
+    )
+    return buf.getvalue()
+
+
+def _encode_global(rgb_frames, cfg, transparency) -> bytes:
+    frames = [gif_palette.quantize(f, cfg) for f in rgb_frames]
+    return renderer_gif.encode_gif(frames, transparency=transparency).getvalue()
+
+
+# Configs dont les couleurs doivent ressortir telles quelles du GIF
+PALETTE_CONFIGS = [
+    {},
+    {"background_color": "#FAFAFA", "text_color": "#123456"},
+    {"background_color": "#000000", "text_color": "#FFFFFF", "circular_progress_color": "#FF3366"},
+]
+
+
+def bench_palette(templates):
+    """
+    Frame unie de chaque couleur de la config -> quantize -> RGB : doit
+    revenir inchangée (fond blanc d'un email = blanc du GIF).
+    """
+    results = []
+    for tpl in templates:
+        for overrides in PALETTE_CONFIGS:
+            cfg = BASE_CONFIG.with_(template=tpl, **overrides)
+            colors = dict.fromkeys(c for pair in gif_palette._pairs(cfg) for c in pair)
+            for color in colors:
+                solid = Image.new("RGB", (cfg.width, cfg.height), color)
+                out = gif_palette.quantize(solid, cfg).convert("RGB").getextrema()
+                got = tuple(lo for lo, _ in out) if all(lo == hi for lo, hi in out) else None
+                results.append({
+                    "template": tpl,
+                    "color": "#%02X%02X%02X" % color,
+                    "got": "#%02X%02X%02X" % got if got else "mixte",
+                    "exact": got == color,
+                })
+    return results
+
+
+def bench_encode(templates, repeat=3):
+    results = []
+    for tpl in templates:
+        cfg = BASE_CONFIG.with_(template=tpl)
+        rgb = [renderer_gif.render_frame_rgb(cfg, r) for r in SAMPLE_REMAINING]
+
+        for name, encode in (
+            ("adaptive", _encode_adaptive),
+            ("global", lambda frames: _encode_global(frames, cfg, False)),
+            ("global+transp", lambda frames: _encode_global(frames, cfg, True)),
+        ):
+            best = math.inf
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                data = encode(rgb)
+                best = min(best, time.perf_counter() - t0)
+
+            decoded = Image.open(BytesIO(data))
+            scores = []
+            for i, ref in enumerate(rgb):
+                decoded.seek(i)
+                scores.append(psnr(ref, decoded))
+
+            results.append({
+                "template": tpl,
+                "palette": name,
+                "frames": len(rgb),
+                "encode_ms": round(best * 1000, 2),
+                "bytes": len(data),
+                "psnr_db_min": round(min(scores), 2),
+            })
+    return results
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def bench_storage(sizes, backends, lookups=2000):
+    results = []
+    for n in sizes:
+        for kind in backends:
+            tmp = tempfile.mkdtemp(prefix="bench-storage-")
+            try:
+                if kind == "sqlite":
+                    backend = storage.SQLiteBackend(os.path.join(tmp, "countdowns.db"))
+                else:
+                    backend = storage.FileBackend(tmp)
+
+                ids = [f"{i:08x}" for i in range(n)]
+                data = BASE_CONFIG.to_dict()
+                t0 = time.perf_counter()
+                if kind == "sqlite":
+                    for i in range(0, n, 10000):
+                        backend.write_many((cid, data, None) for cid in ids[i:i + 10000])
+                else:
+                    for cid in ids:
+                        backend.write(cid, data)
+                load_s = time.perf_counter() - t0
+
+                # Chemin "miss" de ConfigStore : version + lecture
+                sample = random.Random(0).choices(ids, k=lookups)
+                timings = []
+                for cid in sample:
+                    t0 = time.perf_counter()
+                    backend.version(cid)
+                    backend.read(cid)
+                    timings.append((time.perf_counter() - t0) * 1e6)
+
+                results.append({
+                    "backend": kind,
+                    "configs": n,
+                    "load_s": round(load_s, 2),
+                    "lookup_us_p50": round(_percentile(timings, 0.5), 1),
+                    "lookup_us_p99": round(_percentile(timings, 0.99), 1),
+                })
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+# Options de rendu de la matrice "render"
+VARIANTS = {
+    "plain": {},
+    "bold": {"font_bold": True, "label_bold": True, "prefix_bold": True},
+    "nolabels": {"show_labels": False},
+}
+
+_BENCH_NOW = datetime(2025, 1, 1)
+
+
+def _rss_kb() -> int:
+    # ru_maxrss : pic du process, en Ko sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _peak_kb(fn) -> int:
+    """
+    Mémoire maximale (Ko, au-dessus du RSS de départ) atteinte pendant
+    fn(), buffers Pillow compris. Sous Linux le pic du process est remis
+    à zéro avant l'appel (/proc/self/clear_refs) ; ailleurs, delta de
+    ru_maxrss (0 si un pic antérieur était plus haut).
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        base = _proc_status("VmRSS")
+        fn()
+        return max(0, _proc_status("VmHWM") - base)
+    except OSError:
+        base = _rss_kb()
+        fn()
+        return max(0, _rss_kb() - base)
+
+
+def _proc_status(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise OSError(field)
+
+
+def _render_case(case) -> dict:
+    """
+    Un cas de la matrice (exécuté dans un process neuf : le pic RSS est
+    celui de ce cas seul).
+    """
+    tpl, (w, h), loop, variant, state = case
+    cfg = BASE_CONFIG.with_(
+        template=tpl, width=w, height=h, loop_duration=loop, **VARIANTS[variant]
+    )
+    if state == "active":
+        end = _BENCH_NOW + timedelta(days=3, hours=5, minutes=17, seconds=42)
+    else:
+        end = _BENCH_NOW - timedelta(seconds=10)
+    cfg = cfg.with_(target_date=end.isoformat())
+    remainings = renderer_gif._frame_remainings(cfg, end, _BENCH_NOW)
+    rss_base = _rss_kb()
+
+    # 1re frame à froid : polices, couche statique, palette
+    t0 = time.perf_counter()
+    renderer_gif.render_frame(cfg, remainings[0])
+    first_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    frames = [renderer_gif.render_frame(cfg, r) for r in remainings]
+    render_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    data = renderer_gif.encode_gif(frames, renderer_gif.use_transparency(cfg)).getvalue()
+    encode_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(50):
+        renderer_svg.svg_preview(cfg, now=_BENCH_NOW)
+    svg_s = (time.perf_counter() - t0) / 50
+
+    # Pic mémoire d'un GIF : à froid (couches à construire), puis en
+    # régime établi (couches en cache, toutes les frames à rendre)
+    renderer_gif.clear_layers()
+    gif_peak = _peak_kb(lambda: renderer_gif.generate_gif(cfg, end, now=_BENCH_NOW))
+    gif_peak_warm = _peak_kb(
+        lambda: renderer_gif.generate_gif(cfg, end, now=_BENCH_NOW + timedelta(seconds=loop))
+    )
+
+    # Allocations Python d'un generate_gif complet, couches comprises
+    # (les buffers d'image de Pillow sont alloués hors tracemalloc : cf. RSS)
+    renderer_gif.clear_layers()
+    tracemalloc.start()
+    renderer_gif.generate_gif(cfg, end, now=_BENCH_NOW)
+    alloc_peak = tracemalloc.get_traced_memory()[1]
+    alloc_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+
+    peak = _rss_kb()
+    return {
+        "template": tpl,
+        "size": f"{w}x{h}",
+        "loop": loop,
+        "variant": variant,
+        "state": state,
+        "first_frame_ms": round(first_ms, 2),
+        "ms_per_frame": round(render_s * 1000 / len(frames), 3),
+        "encode_ms": round(encode_s * 1000, 2),
+        "bytes": len(data),
+        "svg_us": round(svg_s * 1e6, 1),
+        "peak_rss_kb": peak,
+        "rss_delta_kb": peak - rss_base,
+        "gif_peak_kb": gif_peak,
+        "gif_peak_warm_kb": gif_peak_warm,
+        "alloc_peak_kb": round(alloc_peak / 1024, 1),
+        "alloc_blocks": alloc_blocks,
+    }
+
+
+def bench_render(templates, sizes, loops, variants, states, isolate=True):
+    cases = list(itertools.product(templates, sizes, loops, variants, states))
+    if not isolate:
+        return [_render_case(c) for c in cases]
+    # Un process neuf par cas, l'un après l'autre (pas de bruit de timing)
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx, max_tasks_per_child=1) as ex:
+        return list(ex.map(_render_case, cases))
+
+
+def bench_pool(templates, sizes, loops, workers_list, repeat=3):
+    """
+    Temps d'un generate_gif complet (aucune frame en cache), dans le
+    thread appelant puis réparti sur un FramePool : gain sur UN GIF, et
+    octets identiques.
+    """
+    end = _BENCH_NOW + timedelta(days=3, hours=5, minutes=17, seconds=42)
+    results = []
+    for workers in workers_list:
+        pool = render_pool.FramePool(workers, preload_cfg=BASE_CONFIG)
+        try:
+            for tpl, (w, h), loop in itertools.product(templates, sizes, loops):
+                cfg = BASE_CONFIG.with_(template=tpl, width=w, height=h, loop_duration=loop)
+                # Chauffe : couches, polices, process du pool
+                ref = renderer_gif.generate_gif(cfg, end, now=_BENCH_NOW).getvalue()
+                data = renderer_gif.generate_gif(cfg, end, now=_BENCH_NOW, pool=pool).getvalue()
+
+                timings = {}
+                for name, kwargs in (("seq", {}), ("pool", {"pool": pool})):
+                    best = math.inf
+                    for _ in range(repeat):
+                        t0 = time.perf_counter()
+                        renderer_gif.generate_gif(cfg, end, now=_BENCH_NOW, **kwargs)
+                        best = min(best, time.perf_counter() - t0)
+                    timings[name] = best
+                results.append({
+                    "template": tpl,
+                    "size": f"{w}x{h}",
+                    "loop": loop,
+                    "workers": workers,
+                    "seq_ms": round(timings["seq"] * 1000, 1),
+                    "pool_ms": round(timings["pool"] * 1000, 1),
+                    "speedup": round(timings["seq"] / timings["pool"], 2),
+                    "same_bytes": data == ref,
+                })
+        finally:
+            pool.shutdown()
+    return results
+
+
+def _parse_size(text):
+    w, _, h = text.partition("x")
+    return int(w), int(h)
+
+
+# ============================
+# COMPARAISON À UNE RÉFÉRENCE
+# ============================
+
+# Mesures (plus petit = meilleur) ; les autres colonnes identifient le cas
+METRICS = {
+    "ms_per_frame", "first_frame_ms", "encode_ms", "bytes", "svg_us",
+    "peak_rss_kb", "rss_delta_kb", "gif_peak_kb", "gif_peak_warm_kb",
+    "alloc_peak_kb", "alloc_blocks",
+    "load_s", "lookup_us_p50", "lookup_us_p99",
+}
+
+
+def _case_key(row):
+    return tuple((k, v) for k, v in row.items() if k not in METRICS)
+
+
+def compare(rows, baseline, threshold):
+    """
+    Lignes de comparaison (mesure, référence, actuel, écart %) et nombre
+    de régressions au-delà de `threshold` (0.10 = +10 %).
+    """
+    base = {_case_key(r): r for r in baseline}
+    out = []
+    regressions = 0
+    for row in rows:
+        ref = base.get(_case_key(row))
+        if ref is None:
+            continue
+        case = "/".join(str(v) for _, v in _case_key(row))
+        for metric in sorted(METRICS & row.keys() & ref.keys()):
+            before, after = ref[metric], row[metric]
+            if not isinstance(before, (int, float)) or before <= 0:
+                continue
+            delta = (after - before) / before
+            flag = ""
+            if delta > threshold:
+                flag = "REGRESSION"
+                regressions += 1
+            elif delta < -threshold:
+                flag = "mieux"
+            out.append({
+                "case": case,
+                "metric": metric,
+                "baseline": before,
+                "current": after,
+                "delta_pct": round(delta * 100, 1),
+                "flag": flag,
+            })
+    return out, regressions
+
+
+def _print_table(rows):
+    if not rows:
+        return
+    cols = list(rows[0])
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in cols]
+    print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    for r in rows:
+        print("  ".join(str(r[c]).ljust(w) for c, w in zip(cols, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    parser.add_argument("--save", metavar="FICHIER", help="enregistre les résultats (JSON)")
+    parser.add_argument("--baseline", metavar="FICHIER", help="compare à une référence")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="écart toléré avant régression (0.10 = 10 %%)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    q = sub.add_parser("quality", help="temps par frame et PSNR vs 4x")
+    q.add_argument("--templates", nargs="+", default=["basic", "circular"])
+    q.add_argument("--modes", nargs="+", default=list(renderer_gif.QUALITY_MODES))
+
+    e = sub.add_parser("encode", help="temps d'encodage et taille du GIF")
+    e.add_argument("--templates", nargs="+", default=["basic", "circular"])
+    e.add_argument("--repeat", type=int, default=3)
+
+    pl = sub.add_parser("palette", help="couleurs de la config restituées exactement")
+    pl.add_argument("--templates", nargs="+", default=["basic", "circular"])
+
+    st = sub.add_parser("storage", help="chargement en masse + latence de lecture")
+    st.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000])
+    st.add_argument("--backends", nargs="+", default=["file", "sqlite"])
+    st.add_argument("--lookups", type=int, default=2000)
+
+    r = sub.add_parser("render", help="matrice de rendu GIF + SVG")
+    r.add_argument("--templates", nargs="+", default=["basic", "circular"])
+    r.add_argument("--sizes", nargs="+", type=_parse_size, default=[(300, 100), (600, 200)],
+                   help="LxH")
+    r.add_argument("--loops", nargs="+", type=int, default=[10, 20])
+    r.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    r.add_argument("--states", nargs="+", default=["active", "expired"],
+                   choices=["active", "expired"])
+    r.add_argument("--inline", action="store_true",
+                   help="sans process par cas (plus rapide, RSS cumulé)")
+
+    po = sub.add_parser("pool", help="un GIF : séquentiel vs pool de frames")
+    po.add_argument("--templates", nargs="+", default=["basic", "circular"])
+    po.add_argument("--sizes", nargs="+", type=_parse_size, default=[(600, 200), (1200, 600)],
+                    help="LxH")
+    po.add_argument("--loops", nargs="+", type=int, default=[20, 60])
+    po.add_argument("--workers", nargs="+", type=int, default=[2, os.cpu_count() or 2])
+    po.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args(argv)
+
+    regressions = 0
+    if args.cmd == "quality":
+        rows = bench_quality(args.templates, args.modes)
+    elif args.cmd == "encode":
+        rows = bench_encode(args.templates, args.repeat)
+    elif args.cmd == "palette":
+        rows = bench_palette(args.templates)
+        regressions = sum(not row["exact"] for row in rows)
+    elif args.cmd == "storage":
+        rows = bench_storage(args.sizes, args.backends, args.lookups)
+    elif args.cmd == "pool":
+        rows = bench_pool(args.templates, args.sizes, args.loops, sorted(set(args.workers)),
+                          args.repeat)
+    elif args.cmd == "render":
+        rows = bench_render(args.templates, args.sizes, args.loops, args.variants,
+                            args.states, isolate=not args.inline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            rows, regressions = compare(rows, json.load(f), args.threshold)
+
+    if args.json:
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    else:
+        _print_table(rows)
+
+    if regressions and args.cmd == "palette":
+        print(f"{regressions} couleur(s) altérée(s) par la palette", file=sys.stderr)
+        sys.exit(1)
+    if regressions:
+        print(f"{regressions} régression(s) au-delà de {args.threshold:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
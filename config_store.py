@@ -0,0 +1,116 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+# ============================
+# DÉPÔT DE CONFIGS (cache par worker)
+# ============================
+# load_config faisait exists + open + json.load + merge à CHAQUE requête
+# GIF. Ici : LRU de configs déjà parsées et validées (CountdownConfig,
+# figées : partagées sans copie). Une entrée
+# n'est revalidée (jeton de version du backend : mtime du fichier, colonne
+# version en SQLite) qu'après `ttl` secondes ; entre deux, le chemin chaud
+# ne touche pas au stockage. Les ids inconnus sont mis en cache négatif
+# pour qu'un flot de 404 ne martèle pas le disque.
+
+_MISSING = object()
+
+
+class ConfigStore:
+
+    def __init__(self, backend, parse, ttl: float = 2.0,
+                 negative_ttl: float = 5.0, max_entries: int = 4096):
+        """
+        parse(dict stocké) -> config validée.
+        """
+        self.backend = backend
+        self.parse = parse
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        # cid -> (cfg ou _MISSING, version, vérifié_le, génération)
+        self._entries = OrderedDict()
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.negative_hits = 0
+
+    def load(self, cid: str):
+        """
+        Config validée (objet figé, partagé), ou None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cid)
+            if entry is not None and entry[3] == self.generation:
+                cfg, _, checked, _ = entry
+                ttl = self.negative_ttl if cfg is _MISSING else self.ttl
+                if now - checked < ttl:
+                    self._entries.move_to_end(cid)
+                    if cfg is _MISSING:
+                        self.negative_hits += 1
+                        return None
+                    self.hits += 1
+                    return cfg
+
+        # Revalidation : on ne relit pas la config si sa version n'a pas bougé
+        version = self.backend.version(cid)
+
+        if entry is not None and entry[3] == self.generation and entry[1] == version:
+            with self._lock:
+                self.revalidations += 1
+                self._put(cid, entry[0], version, now)
+            return None if entry[0] is _MISSING else entry[0]
+
+        with self._lock:
+            self.misses += 1
+        cfg = self._read(cid) if version is not None else None
+        with self._lock:
+            self._put(cid, _MISSING if cfg is None else cfg, version, now)
+        return cfg
+
+    def _read(self, cid: str):
+        data = self.backend.read(cid)
+        if data is None:
+            return None
+        return self.parse(data)
+
+    def _put(self, cid, cfg, version, checked):
+        # Verrou déjà tenu par l'appelant
+        self._entries[cid] = (cfg, version, checked, self.generation)
+        self._entries.move_to_end(cid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self, cid: str, data: dict):
+        self.backend.write(cid, data)
+        self.invalidate(cid)
+
+    def invalidate(self, cid: str = None):
+        """
+        Oublie une config (ou toutes : nouvelle génération).
+        """
+        with self._lock:
+            if cid is None:
+                self.generation += 1
+                self._entries.clear()
+            else:
+                self._entries.pop(cid, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "generation": self.generation,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+            }
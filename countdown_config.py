@@ -0,0 +1,182 @@
+import json
+import hashlib
+from dataclasses import dataclass, field, fields, replace
+from datetime import datetime
+
+from PIL import ImageColor
+
+
+# ============================
+# CONFIG DE COUNTDOWN (type unique, validé)
+# ============================
+# Un seul parseur pour le formulaire de réglages, les paramètres de
+# /preview.svg et les JSON stockés. L'objet est figé : il se partage entre
+# threads et caches sans copie, il est hashable (clé directe des LRU) et
+# porte une empreinte stable (`digest`) pour les clés externes (ETag,
+# fichiers pré-rendus, clés de cache).
+
+TEMPLATES = ("basic", "circular")
+QUALITIES = ("native", "2x", "4x", "auto")  # cf. renderer_gif.QUALITY_MODES
+
+# Bornes (min, max) des champs numériques : valeurs hors bornes ramenées
+# dans l'intervalle, valeurs illisibles remplacées par le défaut.
+BOUNDS = {
+    "width": (100, 1200),
+    "height": (50, 600),
+    "font_size": (8, 120),
+    "loop_duration": (1, 60),
+    "circular_thickness": (1, 60),
+    "circular_label_size": (6, 48),
+    "circular_spacing": (0, 200),
+    "circular_inner_ratio": (0.1, 0.95),
+    "basic_label_size": (6, 48),
+    "basic_gap": (0, 100),
+}
+
+MAX_PREFIX_LEN = 200
+
+
+@dataclass(frozen=True, slots=True)
+class CountdownConfig:
+    width: int = 600
+    height: int = 200
+    template: str = "circular"
+
+    # Options communes
+    background_color: str = "#FFFFFF"
+    text_color: str = "#111111"
+    font_size: int = 32
+    message_prefix: str = "Temps restant : "
+    target_date: str = "2025-12-31T23:59:59"
+    show_labels: bool = True
+    loop_duration: int = 20
+    render_quality: str = "4x"
+
+    # Gras
+    font_bold: bool = False
+    label_bold: bool = False
+    prefix_bold: bool = False
+
+    # Template CIRCULAR
+    circular_base_color: str = "#E0EAFF"
+    circular_progress_color: str = "#4C6FFF"
+    circular_thickness: int = 10
+    circular_label_uppercase: bool = True
+    circular_label_size: int = 12
+    circular_label_color: str = "#555555"
+    circular_spacing: int = 24
+    circular_inner_ratio: float = 0.7
+
+    # Template BASIC
+    basic_label_color: str = "#666666"
+    basic_label_size: int = 12
+    basic_gap: int = 4
+
+    # Empreinte stable, calculée une fois
+    digest: str = field(default="", init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        raw = json.dumps(self.to_dict(), sort_keys=True, ensure_ascii=False)
+        object.__setattr__(self, "digest", hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16])
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def with_(self, **changes) -> "CountdownConfig":
+        return replace(self, **changes)
+
+    @property
+    def end_time(self):
+        """
+        Date cible (datetime naïf, UTC), None si illisible.
+        """
+        try:
+            return datetime.fromisoformat(self.target_date)
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def parse(cls, values, checkboxes: bool = False) -> "CountdownConfig":
+        """
+        Config validée depuis un mapping (form, query string, JSON stocké).
+
+        checkboxes=True : booléen absent = case décochée (False) ; sinon
+        un champ absent garde sa valeur par défaut.
+        """
+        out = {}
+        for name, default in _DEFAULTS.items():
+            raw = values.get(name)
+            kind = type(default)
+
+            if kind is bool:
+                if raw is None:
+                    out[name] = False if checkboxes else default
+                else:
+                    out[name] = _parse_bool(raw)
+                continue
+
+            if raw is None or raw == "":
+                out[name] = default
+            elif kind is int or kind is float:
+                out[name] = _parse_number(name, raw, kind, default)
+            elif name.endswith("_color"):
+                out[name] = _parse_color(raw, default)
+            else:
+                out[name] = str(raw)
+
+        if out["template"] not in TEMPLATES:
+            out["template"] = "basic"
+        if out["render_quality"] not in QUALITIES:
+            out["render_quality"] = _DEFAULTS["render_quality"]
+        out["message_prefix"] = out["message_prefix"][:MAX_PREFIX_LEN]
+        out["target_date"] = _normalize_date(out["target_date"])
+        return cls(**out)
+
+
+FIELDS = tuple(f.name for f in fields(CountdownConfig) if f.init)
+_DEFAULTS = {name: getattr(CountdownConfig(), name) for name in FIELDS}
+
+
+def _parse_bool(val) -> bool:
+    if isinstance(val, bool):
+        return val
+    if not val:
+        return False
+    return str(val).lower() in ("1", "true", "on", "yes", "y")
+
+
+def _parse_number(name, raw, kind, default):
+    try:
+        val = kind(raw)
+    except (TypeError, ValueError, OverflowError):  # OverflowError : int(1e999)
+        return default
+    if val != val:  # NaN
+        return default
+    lo, hi = BOUNDS.get(name, (None, None))
+    if lo is not None:
+        val = min(max(val, kind(lo)), kind(hi))
+    return val
+
+
+def _parse_color(raw, default) -> str:
+    # Toute couleur Pillow ("red", "hsl(...)", "#abc") ramenée à #RRGGBB :
+    # les renderers (dégradés, éclaircissement) lisent l'hex directement
+    try:
+        rgb = ImageColor.getrgb(str(raw))
+    except ValueError:
+        return default
+    # getrgb ne borne pas : "rgb(300,0,0)" -> (300, 0, 0)
+    if not all(0 <= c <= 255 for c in rgb):
+        return default
+    return "#%02X%02X%02X" % rgb[:3]
+
+
+def _normalize_date(iso: str) -> str:
+    # "2025-12-31 23:59" / "2025-12-31T23:59" -> "2025-12-31T23:59:00"
+    iso = iso.strip().replace(" ", "T")
+    if len(iso) == 16:
+        iso += ":00"
+    return iso
+
+
+DEFAULT = CountdownConfig()
@@ -0,0 +1,96 @@
+import os
+import threading
+
+from PIL import ImageFont
+
+import metrics
+
+
+# ============================
+# REGISTRE DE POLICES
+# ============================
+# ImageFont.truetype = ouverture du fichier + parsing FreeType : on ne le
+# fait qu'une fois par (police, taille) et par worker. Les .ttf livrés
+# dans templates/ passent avant les polices système, pour ne pas retomber
+# silencieusement sur load_default() sur un hôte sans DejaVu.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FONT_DIR = os.environ.get("FONT_DIR", os.path.join(BASE_DIR, "templates"))
+SYSTEM_FONT_DIR = "/usr/share/fonts/truetype/dejavu"
+
+FONT_FILE = "DejaVuSans.ttf"
+FONT_FILE_BOLD = "DejaVuSans-Bold.ttf"
+
+_lock = threading.Lock()
+_fonts = {}    # (path, px_size) -> FreeTypeFont
+_paths = {}    # bold -> chemin résolu (ou None)
+
+
+def resolve_path(bold: bool = False):
+    """
+    Chemin du .ttf à utiliser : templates/ puis police système.
+    None si aucun fichier n'est trouvé.
+    """
+    if bold in _paths:
+        return _paths[bold]
+    name = FONT_FILE_BOLD if bold else FONT_FILE
+    path = None
+    for folder in (FONT_DIR, SYSTEM_FONT_DIR):
+        candidate = os.path.join(folder, name)
+        if os.path.exists(candidate):
+            path = candidate
+            break
+    _paths[bold] = path
+    return path
+
+
+def get_font(px_size: int, bold: bool = False):
+    """
+    Police normale ou bold à la taille demandée, chargée une seule fois.
+    """
+    path = resolve_path(bold)
+    key = (path, px_size)
+    font = _fonts.get(key)
+    if font is not None:
+        return font
+
+    with _lock, metrics.span("font_load"):
+        font = _fonts.get(key)
+        if font is None:
+            try:
+                font = ImageFont.truetype(path, px_size) if path else ImageFont.load_default()
+            except Exception:
+                font = ImageFont.load_default()
+            _fonts[key] = font
+    return font
+
+
+def preload(sizes, bolds=(False, True)):
+    """
+    Charge à l'avance une liste de tailles (en px) pour chaque graisse.
+    """
+    for bold in bolds:
+        for px_size in sizes:
+            get_font(px_size, bold=bold)
+
+
+def stats() -> dict:
+    """
+    Empreinte du registre. FreeType n'expose pas sa mémoire : on l'estime
+    par la taille des fichiers chargés (chaque face garde le sien).
+    """
+    with _lock:
+        keys = list(_fonts)
+    file_bytes = 0
+    for path, _ in keys:
+        if path:
+            try:
+                file_bytes += os.path.getsize(path)
+            except OSError:
+                pass
+    return {
+        "faces": len(keys),
+        "paths": sorted({os.path.basename(p) for p, _ in keys if p}),
+        "approx_bytes": file_bytes,
+        "fallback": any(p is None for p, _ in keys),
+    }
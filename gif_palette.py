@@ -0,0 +1,222 @@
+import threading
+from functools import lru_cache
+
+from PIL import Image, ImageChops, ImageColor
+
+from countdown_config import CountdownConfig
+
+try:
+    import numpy as np
+except ImportError:  # dépendance optionnelle : repli sur Image.quantize
+    np = None
+
+
+# ============================
+# PALETTE GLOBALE GIF
+# ============================
+# Un countdown n'utilise qu'une poignée de couleurs (fond, texte, labels,
+# cercle de base, progression, glow) plus les dégradés d'antialiasing
+# entre elles. On en dérive UNE palette par config : chaque frame est
+# convertie en "P" avec cette palette (pas de quantification adaptative
+# frame par frame, pas de scintillement) et le GIF n'a qu'une table
+# de couleurs globale.
+#
+# RGB -> index par table exacte : une couleur de la palette (fond, texte,
+# cercle...) retombe sur SA propre entrée, au bit près (Image.quantize
+# cherche une entrée approchée : #FFFFFF sortait en #FCFDFF). Seuls les
+# pixels mélangés (antialiasing) prennent l'entrée la plus proche,
+# calculée une fois par couleur et mémorisée par palette. Sans NumPy :
+# Image.quantize, puis les couleurs de la config recalées sur leur entrée.
+
+# 255 couleurs visibles + 1 index réservé à la transparence des frames delta
+PALETTE_SIZE = 255
+
+
+def _rgb(color: str):
+    try:
+        return ImageColor.getrgb(color)[:3]
+    except (ValueError, AttributeError):
+        return None
+
+
+def _lighten(rgb, factor=0.6):
+    return tuple(int(c + (255 - c) * factor) for c in rgb)
+
+
+def _pairs(cfg: CountdownConfig):
+    """
+    Couples (fond, encre) dont les mélanges apparaissent à l'écran.
+    """
+    bg = _rgb(cfg.background_color)
+    text = _rgb(cfg.text_color)
+    pairs = [(bg, text)]
+
+    if cfg.template == "basic":
+        pairs.append((bg, _rgb(cfg.basic_label_color)))
+    else:
+        base = _rgb(cfg.circular_base_color)
+        progress = _rgb(cfg.circular_progress_color)
+        glow = _lighten(progress) if progress else None
+        pairs += [
+            (bg, _rgb(cfg.circular_label_color)),
+            (bg, base),
+            (bg, glow),
+            (bg, progress),
+            (base, glow),
+            (base, progress),
+            (glow, progress),
+        ]
+    return [(a, b) for a, b in pairs if a is not None and b is not None]
+
+
+@lru_cache(maxsize=256)
+def _build(colors_key) -> Image.Image:
+    pairs = [(colors_key[i], colors_key[i + 1]) for i in range(0, len(colors_key), 2)]
+
+    # Couleurs "pures" d'abord, puis des rampes réparties sur la place restante
+    anchors = []
+    for a, b in pairs:
+        for c in (a, b):
+            if c not in anchors:
+                anchors.append(c)
+
+    entries = list(anchors)
+    unique_pairs = list(dict.fromkeys(p for p in pairs if p[0] != p[1]))
+    if unique_pairs:
+        steps = max(2, (PALETTE_SIZE - len(entries)) // len(unique_pairs) + 1)
+        for a, b in unique_pairs:
+            for k in range(1, steps):
+                t = k / steps
+                c = tuple(round(a[i] + (b[i] - a[i]) * t) for i in range(3))
+                if c not in entries and len(entries) < PALETTE_SIZE:
+                    entries.append(c)
+
+    # Pas de bourrage : des entrées dupliquées rendent le remappage de
+    # palette de l'encodeur GIF quadratique.
+    flat = [v for c in entries for v in c]
+
+    pal = Image.new("P", (1, 1))
+    pal.putpalette(flat)
+    pal.info["reserved"] = _unused_color(entries)
+    pal.info["anchors"] = anchors
+    pal.info["lookup"] = _Lookup(entries) if np is not None else None
+    return pal
+
+
+class _Lookup:
+    """
+    Table couleur -> index, complétée au fil des frames (quelques
+    centaines de couleurs distinctes par config). Pixels lus en RGBX (un
+    uint32 par pixel), table de hachage à adressage direct dont chaque
+    case vaut couleur << 8 | index : un seul gather par pixel ; les rares
+    collisions passent par le dict.
+    """
+
+    def __init__(self, entries):
+        self.entries = np.array(entries, dtype=np.int32)
+        self._lock = threading.Lock()
+        self._colors = {}  # couleur RGBX -> index
+        self._state = (10, None)  # (bits, table)
+        r, g, b = self.entries.T.astype(np.uint32)
+        self._learn(r | (g << 8) | (b << 16))
+
+    @staticmethod
+    def _slots(keys, bits):
+        return ((keys * np.uint32(2654435761)) >> np.uint32(32 - bits)).astype(np.intp)
+
+    def _learn(self, keys):
+        # Entrée la plus proche (distance euclidienne) ; une couleur de la
+        # palette est à distance 0 de sa propre entrée, unique
+        keys = np.array([k for k in keys.tolist() if k not in self._colors], dtype=np.uint32)
+        if not len(keys):
+            return
+        rgb = np.stack([keys & 255, (keys >> 8) & 255, (keys >> 16) & 255], axis=1).astype(np.int32)
+        dist = ((rgb[:, np.newaxis, :] - self.entries[np.newaxis, :, :]) ** 2).sum(axis=2)
+        self._colors.update(zip(keys.tolist(), dist.argmin(axis=1).tolist()))
+
+        # Une case sur 16 occupée : peu de collisions
+        bits = self._state[0]
+        while len(self._colors) * 16 > (1 << bits):
+            bits += 1
+        packed = np.fromiter(
+            ((k << 8) | i for k, i in self._colors.items()), dtype=np.uint32, count=len(self._colors)
+        )
+        # Case vide : une entrée quelconque (juste pour sa propre couleur,
+        # fausse pour les autres, donc traitée comme une collision)
+        table = np.full(1 << bits, packed[0], dtype=np.uint32)
+        slots, first = np.unique(self._slots(packed >> 8, bits), return_index=True)
+        table[slots] = packed[first]
+        # Publiées d'un bloc : les lecteurs ne prennent pas le verrou
+        self._state = (bits, table)
+
+    def indices(self, frame: Image.Image):
+        keys = np.frombuffer(frame.tobytes("raw", "RGBX"), dtype="<u4") & np.uint32(0xFFFFFF)
+        bits, table = self._state
+        found = table.take(self._slots(keys, bits))
+        index = found.astype(np.uint8)
+        missing = (found >> 8) != keys
+        if missing.any():
+            unknown, inverse = np.unique(keys[missing], return_inverse=True)
+            with self._lock:
+                self._learn(unknown)
+                known = np.array([self._colors[k] for k in unknown.tolist()], dtype=np.uint8)
+            index[missing] = known[inverse]
+        return index
+
+
+def _fix_anchors(frame, out, anchors):
+    # Sans NumPy : les pixels exactement égaux à une couleur de la config
+    # reprennent son entrée (index = rang dans la palette)
+    for index, color in enumerate(anchors):
+        diff = ImageChops.difference(frame, Image.new("RGB", frame.size, color)).split()
+        exact = ImageChops.lighter(ImageChops.lighter(diff[0], diff[1]), diff[2])
+        out.paste(index, mask=exact.point(lambda v: 255 if v == 0 else 0))
+
+
+def _unused_color(entries):
+    # Couleur de l'index transparent : absente de la palette (les couleurs
+    # doivent rester uniques pour que l'encodeur garde les index tels quels)
+    taken = set(entries)
+    for r in range(255, -1, -1):
+        c = (r, 0, 255)
+        if c not in taken:
+            return c
+    return None
+
+
+def palette_for(cfg: CountdownConfig):
+    """
+    Image "P" 1x1 portant la palette globale de la config (mise en cache).
+    None si aucune couleur de la config n'est exploitable.
+    """
+    key = tuple(c for pair in _pairs(cfg) for c in pair)
+    if not key:
+        return None
+    return _build(key)
+
+
+def quantize(frame: Image.Image, cfg: CountdownConfig) -> Image.Image:
+    """
+    RGB -> "P" avec la palette globale (couleur exacte, sinon la plus
+    proche, sans tramage : les dégradés sont déjà dans la palette).
+    """
+    pal = palette_for(cfg)
+    if pal is None:
+        return frame.convert("P", palette=Image.ADAPTIVE)
+    lookup = pal.info["lookup"]
+    if lookup is not None and frame.mode == "RGB":
+        out = Image.frombytes("P", frame.size, lookup.indices(frame).tobytes())
+        out.putpalette(pal.getpalette())
+    else:
+        out = frame.quantize(palette=pal, dither=Image.Dither.NONE)
+        if frame.mode == "RGB":
+            _fix_anchors(frame, out, pal.info["anchors"])
+
+    # Index réservé ajouté APRÈS quantification : aucun pixel ne l'utilise,
+    # l'encodeur s'en sert pour les pixels inchangés des frames delta.
+    reserved = pal.info.get("reserved")
+    if reserved is not None:
+        palette = out.getpalette()
+        out.putpalette(palette + list(reserved))
+        out.info["transparency"] = len(palette) // 3
+    return out
@@ -0,0 +1,119 @@
+import os
+import math
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw
+
+
+# ============================
+# ATLAS DE GLYPHES
+# ============================
+# Seules 100 chaînes "00".."99" existent par unité : plutôt que de passer
+# par FreeType à chaque frame, on garde des tuiles déjà antialiasées
+# (masques "L") et on les colle avec Image.paste(couleur, box, masque).
+# Le masque ne dépend pas de la couleur, donc une tuile sert à tous les
+# countdowns qui partagent la même typo (police, taille, gras).
+
+class GlyphAtlas:
+    """
+    Tuiles de texte pré-rasterisées, LRU borné en octets.
+    Clé = (chemin police, taille, texte, décalage sub-pixel x, y).
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._tiles = OrderedDict()  # key -> (dx, dy, mask)
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def tile(self, font, text: str, fx: float = 0.0, fy: float = 0.0):
+        """
+        Renvoie (dx, dy, masque) : le masque se colle en
+        (floor(x) + dx, floor(y) + dy) pour un texte dessiné en (x, y).
+        None si la police n'est pas identifiable (police par défaut).
+        """
+        path = getattr(font, "path", None)
+        if not isinstance(path, str):
+            return None
+        key = (path, font.size, text, fx, fy)
+
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = _rasterize(font, text, fx, fy)
+        size = entry[2].width * entry[2].height
+
+        with self._lock:
+            if key not in self._tiles:
+                self._tiles[key] = entry
+                self._size += size
+                while self._tiles and self._size > self.max_bytes:
+                    _, (_, _, old) = self._tiles.popitem(last=False)
+                    self._size -= old.width * old.height
+                    self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "tiles": len(self._tiles),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _rasterize(font, text: str, fx: float, fy: float):
+    # Bbox d'encre + 1 px de marge ; on dessine toujours à des coordonnées
+    # positives pour retrouver exactement le même positionnement sub-pixel
+    # que draw.text sur le canvas.
+    l, t, r, b = font.getbbox(text)
+    px, py = max(0, 1 - l), max(0, 1 - t)
+    mask = Image.new("L", (r + 2 + px, b + 2 + py), 0)
+    ImageDraw.Draw(mask).text((fx + px, fy + py), text, font=font, fill=255)
+    mask = mask.crop((l - 1 + px, t - 1 + py, r + 2 + px, b + 2 + py))
+    return l - 1, t - 1, mask
+
+
+ATLAS = GlyphAtlas(max_bytes=int(os.environ.get("GLYPH_ATLAS_MAX_BYTES", str(32 * 1024 * 1024))))
+
+
+def blit_text(img: Image.Image, xy, text: str, font, fill):
+    """
+    Équivalent de ImageDraw.Draw(img).text(xy, text, font=font, fill=fill),
+    servi depuis l'atlas.
+    """
+    x, y = xy
+    ix, iy = math.floor(x), math.floor(y)
+    entry = ATLAS.tile(font, text, x - ix, y - iy)
+    if entry is None:
+        ImageDraw.Draw(img).text(xy, text, font=font, fill=fill)
+        return
+    dx, dy, mask = entry
+    img.paste(fill, (ix + dx, iy + dy), mask)
+
+
+def preload(font, texts):
+    """
+    Pré-rasterise une liste de textes (ex. "00".."99") pour une police.
+    """
+    for text in texts:
+        ATLAS.tile(font, text)
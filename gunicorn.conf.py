@@ -1,9 +1,48 @@
+import gc
 import os
+import time
+
+_BOOT = time.monotonic()
 
 bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
 workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
 threads = 2
+# "uvicorn.workers.UvicornWorker" avec asgi:application (cf. asgi.py)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
 timeout = 120
 accesslog = "-"
 errorlog = "-"
 loglevel = "info"
+
+# App chargée et préparée dans le master avant le fork (cf. warmup.py)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+WARMUP = os.environ.get("WARMUP", "1") == "1"
+
+
+def on_starting(server):
+    # Instantanés de métriques d'un lancement précédent (cf. metrics.py)
+    import metrics
+    metrics.REGISTRY.clear_dir()
+
+    if preload_app and WARMUP:
+        import warmup
+        warmup.run()
+        # Les workers ne doivent pas hériter des compteurs du warm-up
+        metrics.REGISTRY.reset()
+        # Objets du warm-up hors du GC : pas de réécriture des pages
+        # partagées par le ramasse-miettes des workers
+        gc.freeze()
+
+
+def when_ready(server):
+    elapsed = (time.monotonic() - _BOOT) * 1000
+    if preload_app and WARMUP:
+        import warmup
+        warmup.mark_ready(elapsed)
+    server.log.info("Démarrage en %.0f ms (preload_app=%s)", elapsed, preload_app)
+
+
+def post_worker_init(worker):
+    if not preload_app and WARMUP:
+        import warmup
+        warmup.run()
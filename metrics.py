@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import bisect
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+# ============================
+# MÉTRIQUES (format texte Prometheus)
+# ============================
+# Compteurs et histogrammes en mémoire par process, sans dépendance.
+# Chaque worker gunicorn (et chaque process du pool de rendu) écrit son
+# instantané dans METRICS_DIR/<pid>.json, en fin de requête et au plus
+# une fois par `flush_interval` (écriture atomique) ; /metrics additionne
+# les fichiers de tous les process. Les fichiers des workers morts
+# restent : leurs compteurs ne "reculent" pas. Le dossier est vidé au
+# démarrage du master (hook on_starting de gunicorn.conf.py).
+#
+# Coût d'un enregistrement : un perf_counter, un verrou, un bisect ;
+# aucune E/S sur le chemin de rendu.
+
+log = logging.getLogger(__name__)
+
+# Bornes des histogrammes de durée (secondes)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "countdown_http_requests_total": "Requêtes HTTP par endpoint et statut",
+    "countdown_http_request_seconds": "Durée des requêtes HTTP",
+    "countdown_http_response_bytes_total": "Octets envoyés (corps des réponses)",
+    "countdown_stage_seconds": "Durée des étapes de rendu",
+    "countdown_gif_renders_total": "GIF rendus (hors caches HTTP, disque, mémoire)",
+    "countdown_gif_frames_rendered_total": "Frames dessinées",
+    "countdown_gif_frames_reused_total": "Frames reprises de la fenêtre partagée",
+    "countdown_gif_bytes_total": "Octets de GIF encodés",
+    "countdown_cache_hits_total": "Succès de cache par couche",
+    "countdown_cache_misses_total": "Échecs de cache par couche",
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Registry:
+
+    def __init__(self, directory: str = None, flush_interval: float = 1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters = {}   # (nom, labels) -> valeur
+        self._hists = {}      # (nom, labels) -> [comptes par borne..., +Inf, somme]
+        self._collectors = []
+        self._last_flush = 0.0
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError:
+                log.warning("métriques : dossier %s inutilisable, agrégation désactivée", directory)
+                self.directory = None
+
+    # ---------- enregistrement ----------
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _key(name, labels)
+        idx = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            hist = self._hists.get(key)
+            if hist is None:
+                hist = self._hists[key] = [0] * (len(BUCKETS) + 2)
+            hist[idx] += 1
+            hist[-1] += seconds
+
+    @contextmanager
+    def span(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("countdown_stage_seconds", time.perf_counter() - t0, stage=stage)
+
+    def add_collector(self, fn):
+        """
+        fn() -> [(nom, {labels}, valeur), ...] : compteurs lus à chaque
+        instantané (statistiques des caches, déjà cumulées ailleurs).
+        """
+        self._collectors.append(fn)
+
+    def reset(self):
+        """
+        Remet compteurs et histogrammes à zéro (master gunicorn après le
+        warm-up : les workers forkés ne doivent pas hériter de ses valeurs).
+        """
+        with self._lock:
+            self._counters.clear()
+            self._hists.clear()
+
+    # ---------- instantanés / agrégation ----------
+
+    def snapshot(self) -> dict:
+        collected = []
+        for fn in self._collectors:
+            try:
+                collected.extend(fn())
+            except Exception:
+                log.exception("métriques : collecteur en échec")
+        with self._lock:
+            counters = [[n, dict(l), v] for (n, l), v in self._counters.items()]
+            hists = [[n, dict(l), list(h)] for (n, l), h in self._hists.items()]
+        counters += [[n, l, v] for n, l, v in collected]
+        return {"counters": counters, "histograms": hists}
+
+    def maybe_flush(self):
+        """
+        À appeler hors de tout verrou (fin de requête, fin de paquet du
+        pool) : les collecteurs lisent les stats des caches.
+        """
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError:
+            log.exception("métriques : écriture de %s impossible", path)
+
+    def clear_dir(self):
+        """
+        Supprime les instantanés (démarrage du master gunicorn).
+        """
+        if not self.directory:
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".json") or name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        out = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    out.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return out
+
+    def render(self) -> str:
+        """
+        Somme des instantanés de tous les workers, au format texte Prometheus.
+        """
+        counters = {}
+        hists = {}
+        for snap in self._snapshots():
+            for name, labels, value in snap.get("counters", ()):
+                key = _key(name, labels)
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snap.get("histograms", ()):
+                key = _key(name, labels)
+                acc = hists.get(key)
+                if acc is None or len(acc) != len(values):
+                    hists[key] = list(values)
+                else:
+                    hists[key] = [a + b for a, b in zip(acc, values)]
+
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+
+        for (name, labels), values in sorted(hists.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), values[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(bound)
+                lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(values[-1])}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _fmt_labels(labels) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + inner + "}"
+
+
+def _fmt_value(value) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def _default_dir():
+    # METRICS_DIR="" : pas d'agrégation, /metrics ne montre que le worker courant
+    path = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), "countdown-metrics"))
+    return path or None
+
+
+REGISTRY = Registry(_default_dir())
+
+# Raccourcis pour les appels depuis le code de rendu
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+span = REGISTRY.span
@@ -0,0 +1,321 @@
+import os
+import json
+import time
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import renderer_gif
+
+
+# ============================
+# PRÉ-RENDU DES COUNTDOWNS CHAUDS
+# ============================
+# Un thread de fond garde sur disque le GIF de la seconde courante et des
+# quelques suivantes pour les N countdowns les plus demandés. Le worker
+# web n'a plus qu'à faire send_file : zéro rendu dans la requête.
+# Fichiers : <dir>/<id>-<hash config>-<seconde epoch>.gif, supprimés dès
+# que leur seconde de départ est passée.
+#
+# Le top N porte sur toute la machine : chaque worker publie ses
+# compteurs dans <dir>/.hot/<pid>.json (au plus une fois par
+# `share_interval`, écriture atomique, comme metrics.py) et le worker qui
+# tient le verrou additionne les fichiers récents à chaque cycle. Il
+# publie en retour la liste des ids pré-rendus (<dir>/hot.json) : les
+# autres ids ne tentent aucune ouverture de fichier.
+
+log = logging.getLogger(__name__)
+
+
+class HotCounter:
+    """
+    Compteurs de requêtes par countdown, divisés par deux toutes les
+    `half_life` secondes (les countdowns refroidis sortent du top).
+    """
+
+    def __init__(self, half_life: float = 60.0, max_ids: int = 10000):
+        self.half_life = half_life
+        self.max_ids = max_ids
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._last_decay = time.monotonic()
+
+    def hit(self, cid: str):
+        with self._lock:
+            self._counts[cid] = self._counts.get(cid, 0.0) + 1.0
+            if len(self._counts) > self.max_ids:
+                self._decay(force=True)
+
+    def _decay(self, force=False):
+        # Verrou déjà tenu par l'appelant
+        now = time.monotonic()
+        if not force and now - self._last_decay < self.half_life:
+            return
+        self._last_decay = now
+        self._counts = {k: v / 2 for k, v in self._counts.items() if v >= 1.0}
+
+    def top(self, n: int):
+        with self._lock:
+            self._decay()
+            return [cid for cid, _ in heapq.nlargest(n, self._counts.items(), key=lambda kv: kv[1])]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._decay()
+            return dict(self._counts)
+
+
+def _epoch(dt: datetime) -> int:
+    return int((dt - datetime(1970, 1, 1)).total_seconds())
+
+
+class Prerenderer:
+
+    def __init__(self, cache_dir: str, load_fn, window_fn=None, hot: int = 20,
+                 ahead: int = 3, interval: float = 0.5, counter: HotCounter = None,
+                 share_interval: float = 1.0):
+        """
+        load_fn(cid) -> CountdownConfig ou None ;
+        window_fn(cid, digest) -> FrameWindow (frames partagées entre secondes).
+        """
+        self.cache_dir = cache_dir
+        self.load_fn = load_fn
+        self.window_fn = window_fn
+        self.hot = hot
+        self.ahead = ahead
+        self.interval = interval
+        self.counter = counter or HotCounter()
+        self.share_interval = share_interval
+        self._last_share = 0.0
+
+        self._thread = None
+        self._lock_file = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._lock = threading.Lock()
+        self._rendered_ids = frozenset()  # ids de hot.json
+        self._rendered_mtime = None
+        self._rendered_checked = 0.0
+        self._published = None  # dernière liste écrite par le leader
+
+        self.rendered = 0
+        self.served = 0
+        self.collected = 0
+
+    def path(self, cid: str, chash: str, start: datetime) -> str:
+        return os.path.join(self.cache_dir, f"{cid}-{chash}-{_epoch(start)}.gif")
+
+    def lookup(self, cid: str, chash: str, start: datetime):
+        """
+        GIF pré-rendu pour cette seconde (fichier ouvert : le ramasse-miettes
+        peut le supprimer pendant l'envoi sans gêner), ou None. Sans
+        appel système si le pré-rendu est désactivé ou si `cid` n'en fait
+        pas partie.
+        """
+        if self.hot <= 0 or cid not in self._prerendered():
+            return None
+        try:
+            f = open(self.path(cid, chash, start), "rb")
+        except OSError:
+            return None
+        with self._lock:
+            self.served += 1
+        return f
+
+    def _hot_list(self) -> str:
+        return os.path.join(self.cache_dir, "hot.json")
+
+    def _prerendered(self) -> frozenset:
+        # hot.json relu au plus une fois par `interval`, et seulement s'il
+        # a changé
+        now = time.monotonic()
+        if now - self._rendered_checked < self.interval:
+            return self._rendered_ids
+        with self._lock:
+            if now - self._rendered_checked < self.interval:
+                return self._rendered_ids
+            self._rendered_checked = now
+            try:
+                mtime = os.stat(self._hot_list()).st_mtime_ns
+                if mtime != self._rendered_mtime:
+                    with open(self._hot_list(), encoding="utf-8") as f:
+                        self._rendered_ids = frozenset(json.load(f))
+                    self._rendered_mtime = mtime
+            except (OSError, ValueError):
+                self._rendered_ids = frozenset()
+                self._rendered_mtime = None
+            return self._rendered_ids
+
+    def _publish_rendered(self, ids):
+        path = self._hot_list()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(sorted(ids), f)
+            os.replace(tmp, path)
+        except OSError:
+            log.exception("pré-rendu : écriture de %s impossible", path)
+
+    # ---------- compteurs partagés entre workers ----------
+
+    def hit(self, cid: str):
+        """
+        Requête sur `cid` : compteur local, publié pour le worker leader.
+        """
+        self.counter.hit(cid)
+        if self.hot > 0 and time.monotonic() - self._last_share >= self.share_interval:
+            self.share()
+
+    def _hot_dir(self) -> str:
+        return os.path.join(self.cache_dir, ".hot")
+
+    def share(self):
+        self._last_share = time.monotonic()
+        path = os.path.join(self._hot_dir(), f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        try:
+            os.makedirs(self._hot_dir(), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.counter.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError:
+            log.exception("pré-rendu : écriture de %s impossible", path)
+
+    def top(self, n: int):
+        """
+        Les `n` countdowns les plus demandés, tous workers confondus. Les
+        fichiers plus vieux qu'une demi-vie (worker mort ou sans trafic)
+        sont supprimés.
+        """
+        self.share()
+        totals = {}
+        limit = time.time() - self.counter.half_life
+        try:
+            names = os.listdir(self._hot_dir())
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self._hot_dir(), name)
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    counts = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for cid, count in counts.items():
+                totals[cid] = totals.get(cid, 0.0) + count
+        if not totals:
+            return self.counter.top(n)
+        return [cid for cid, _ in heapq.nlargest(n, totals.items(), key=lambda kv: kv[1])]
+
+    # ---------- thread de fond ----------
+
+    def ensure_started(self):
+        """
+        Démarre le thread au premier appel (après le fork gunicorn). Un seul
+        worker par machine le fait tourner : verrou fichier non bloquant.
+        """
+        if self._thread is not None or self.hot <= 0:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if not self._acquire_leader():
+                self._thread = False  # un autre worker s'en charge
+                return
+            self._thread = threading.Thread(target=self._run, name="prerender", daemon=True)
+            self._thread.start()
+
+    def _acquire_leader(self) -> bool:
+        try:
+            import fcntl
+        except ImportError:
+            return True
+        f = open(os.path.join(self.cache_dir, ".scheduler.lock"), "w")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_file = f
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                log.exception("pré-rendu : échec du cycle")
+            self._stop.wait(self.interval)
+
+    def tick(self, now: datetime = None):
+        now = (now or datetime.utcnow()).replace(microsecond=0)
+        ids = []
+        for cid in self.top(self.hot):
+            cfg = self.load_fn(cid)
+            end_time = cfg.end_time if cfg is not None else None
+            if end_time is None:
+                continue
+            ids.append(cid)
+            chash = cfg.digest
+            window = self.window_fn(cid, chash) if self.window_fn else None
+            for i in range(self.ahead + 1):
+                start = now + timedelta(seconds=i)
+                path = self.path(cid, chash, start)
+                if os.path.exists(path):
+                    continue
+                data = renderer_gif.generate_gif(
+                    cfg, end_time, now=start, frames_window=window
+                ).getvalue()
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)  # atomique : jamais de fichier à moitié écrit
+                with self._lock:
+                    self.rendered += 1
+        if set(ids) != self._published:
+            self._publish_rendered(ids)
+            self._published = set(ids)
+        self.collect(now)
+
+    def collect(self, now: datetime):
+        """
+        Supprime les GIF dont la seconde de départ est passée.
+        """
+        limit = _epoch(now)
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".gif"):
+                continue
+            try:
+                start = int(name[:-4].rsplit("-", 1)[1])
+            except (IndexError, ValueError):
+                continue
+            if start < limit:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    with self._lock:
+                        self.collected += 1
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "dir": self.cache_dir,
+            "hot": self.hot,
+            "ahead": self.ahead,
+            "running": bool(self._thread),
+            "top": self.top(5) if self.hot > 0 else self.counter.top(5),
+            "rendered": self.rendered,
+            "served": self.served,
+            "collected": self.collected,
+        }
@@ -0,0 +1,127 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import renderer_gif
+from countdown_config import CountdownConfig
+
+
+# ============================
+# BUDGET DE RENDU
+# ============================
+# Coût estimé d'un GIF = pixels du canvas supersamplé x nombre de frames.
+# En 4x, 600x200 sur 20 s ≈ 38 M ; 1200x600 sur 60 s ≈ 690 M (plusieurs
+# Go alloués, timeout gunicorn). Vérifié à l'enregistrement et à chaque
+# requête : au-delà de RENDER_MAX_COST la config est dégradée (qualité
+# puis durée de boucle) ou refusée (RENDER_OVER_BUDGET=reject).
+# Les rendus "lourds" (>= RENDER_HEAVY_COST) passent en plus par un
+# sémaphore par worker : quelques countdowns pathologiques ne peuvent
+# pas occuper tous les threads.
+
+MAX_COST = int(os.environ.get("RENDER_MAX_COST", str(200_000_000)))
+HEAVY_COST = int(os.environ.get("RENDER_HEAVY_COST", str(50_000_000)))
+OVER_BUDGET = os.environ.get("RENDER_OVER_BUDGET", "degrade")  # degrade / reject
+
+# Qualités de la plus chère à la moins chère
+_DEGRADE_ORDER = ("4x", "2x", "auto", "native")
+
+
+class RenderBusy(Exception):
+    """
+    Trop de rendus lourds en cours dans ce worker.
+    """
+
+
+def frame_cost(cfg: CountdownConfig) -> int:
+    scale, arc_scale = renderer_gif.quality_scales(cfg)
+    cost = cfg.width * cfg.height * scale * scale
+    if arc_scale:
+        # "auto" : patchs d'anneaux supersamplés, ~ un second canvas
+        cost *= 2
+    return cost
+
+
+def render_cost(cfg: CountdownConfig) -> int:
+    return frame_cost(cfg) * cfg.loop_duration
+
+
+def fit(cfg: CountdownConfig):
+    """
+    La config si elle tient dans le budget, sinon sa version dégradée
+    (ou None en mode reject).
+    """
+    if render_cost(cfg) <= MAX_COST:
+        return cfg
+    if OVER_BUDGET == "reject":
+        return None
+
+    start = _DEGRADE_ORDER.index(cfg.render_quality) if cfg.render_quality in _DEGRADE_ORDER else 0
+    for quality in _DEGRADE_ORDER[start + 1:]:
+        cheaper = cfg.with_(render_quality=quality)
+        if render_cost(cheaper) <= MAX_COST:
+            return cheaper
+
+    cheaper = cfg.with_(render_quality="native")
+    frames = max(1, MAX_COST // frame_cost(cheaper))
+    return cheaper.with_(loop_duration=min(cfg.loop_duration, frames))
+
+
+class HeavyGate:
+    """
+    Sémaphore par worker pour les rendus lourds ; attente bornée par
+    `timeout`, puis RenderBusy (-> 503).
+    """
+
+    def __init__(self, limit: int = 2, timeout: float = 10.0, heavy_cost: int = HEAVY_COST):
+        self.limit = limit
+        self.timeout = timeout
+        self.heavy_cost = heavy_cost
+        self._sem = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self, cfg: CountdownConfig) -> bool:
+        """
+        True si un jeton a été pris (à rendre avec release()), False si le
+        rendu est léger. Lève RenderBusy si l'attente expire.
+        """
+        if render_cost(cfg) < self.heavy_cost:
+            return False
+        if not self._sem.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            raise RenderBusy()
+        with self._lock:
+            self.admitted += 1
+        return True
+
+    def release(self):
+        self._sem.release()
+
+    @contextmanager
+    def admit(self, cfg: CountdownConfig):
+        taken = self.acquire(cfg)
+        try:
+            yield
+        finally:
+            if taken:
+                self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "heavy_cost": self.heavy_cost,
+                "max_cost": MAX_COST,
+                "over_budget": OVER_BUDGET,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+def from_env() -> HeavyGate:
+    return HeavyGate(
+        limit=int(os.environ.get("RENDER_HEAVY_CONCURRENCY", "2")),
+        timeout=float(os.environ.get("RENDER_HEAVY_WAIT", "10")),
+    )
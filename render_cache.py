@@ -0,0 +1,383 @@
+import threading
+from collections import OrderedDict
+
+
+# ============================
+# CACHE DE RENDU GIF
+# ============================
+# Clé = (countdown_id, hash de config, seconde de départ).
+# Deux ouvertures du même countdown dans la même seconde produisent
+# exactement le même GIF : on ne le calcule qu'une fois.
+
+class RenderCache:
+    """
+    Cache LRU borné en octets + nombre d'entrées, avec dé-duplication
+    des rendus concurrents (single-flight) : si 50 threads demandent la
+    même clé en même temps, un seul rend, les autres attendent le résultat.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 512):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> bytes
+        self._inflight = {}            # key -> _Flight
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
+
+    def get_or_render(self, key, render_fn) -> bytes:
+        """
+        Renvoie les octets en cache pour `key`, sinon appelle `render_fn()`
+        (une seule fois par clé, même sous forte concurrence).
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = _Flight()
+                self._inflight[key] = flight
+                leader = True
+                self.misses += 1
+            else:
+                leader = False
+                self.waits += 1
+
+        if not leader:
+            flight.event.wait()
+            if isinstance(flight.error, _Abandoned):
+                # Leader en streaming parti en cours de route : on reprend
+                return self.get_or_render(key, render_fn)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            data = render_fn()
+        except BaseException as exc:
+            self._settle(key, flight, error=exc)
+            raise
+
+        self._settle(key, flight, data=data)
+        return data
+
+    def stream(self, key, iter_fn, admit=None):
+        """
+        Version streaming de get_or_render : itérateur d'octets pour `key`.
+        Le premier demandeur (leader) produit le GIF via `iter_fn()` ; les
+        demandes concurrentes de la même clé relaient ses morceaux au fil
+        de l'eau au lieu de rendre à leur tour. Le GIF complet est mis en
+        cache à la fin du flux.
+
+        `admit()` (optionnel) est appelé par le leader seul, avant le
+        rendu, et renvoie une fonction de libération (ou None) appelée en
+        fin de flux ; s'il lève (ex. RenderBusy), l'exception remonte ici.
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return iter((data,))
+
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.waits += 1
+                return self._follow(key, flight, iter_fn, admit)
+            flight = _Flight()
+            self._inflight[key] = flight
+            self.misses += 1
+
+        try:
+            release = admit() if admit is not None else None
+        except BaseException as exc:
+            self._settle(key, flight, error=exc)
+            raise
+        lead = self._lead(key, flight, iter_fn, release)
+        # Amorcé jusqu'au try : close() sans itération (HEAD, client déjà
+        # parti) libère quand même le vol et le jeton
+        next(lead)
+        return lead
+
+    def _lead(self, key, flight, iter_fn, release):
+        try:
+            yield
+            for chunk in iter_fn():
+                with flight.cond:
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+                yield chunk
+        except GeneratorExit:
+            # Client du leader déconnecté : les suiveurs prennent le relais
+            self._settle(key, flight, error=_Abandoned())
+            raise
+        except BaseException as exc:
+            self._settle(key, flight, error=exc)
+            raise
+        else:
+            self._settle(key, flight, data=b"".join(flight.chunks))
+        finally:
+            if release is not None:
+                release()
+
+    def _follow(self, key, flight, iter_fn, admit):
+        index = 0  # morceaux du leader déjà relayés
+        sent = 0   # octets déjà relayés
+        while True:
+            with flight.cond:
+                while index == len(flight.chunks) and not flight.event.is_set():
+                    flight.cond.wait()
+                chunks = flight.chunks[index:]
+                done = flight.event.is_set()
+            index += len(chunks)
+            for chunk in chunks:
+                sent += len(chunk)
+                yield chunk
+            if done:
+                break
+
+        if flight.result is not None:
+            if len(flight.result) > sent:
+                yield flight.result[sent:]
+            return
+        if not isinstance(flight.error, _Abandoned):
+            raise flight.error
+
+        # Rendu déterministe : on reprend le flux et on saute ce qui a
+        # déjà été envoyé
+        for chunk in self.stream(key, iter_fn, admit):
+            if sent >= len(chunk):
+                sent -= len(chunk)
+                continue
+            yield chunk[sent:]
+            sent = 0
+
+    def _settle(self, key, flight, data=None, error=None):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if data is not None:
+                self._store(key, data)
+        with flight.cond:
+            flight.result = data
+            flight.error = error
+            flight.event.set()
+            flight.cond.notify_all()
+
+    def get(self, key):
+        """
+        Lecture seule (pas de rendu) : None si absent.
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def peek(self, key):
+        """
+        Comme get, mais un absent n'est pas compté : pour un chemin rapide
+        suivi de get_or_render, qui compte lui-même l'échec.
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return data
+
+    def put(self, key, data: bytes):
+        with self._lock:
+            self._store(key, data)
+
+    def _store(self, key, data: bytes):
+        # Verrou déjà tenu par l'appelant
+        size = len(data)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = data
+        self._size += size
+        while self._entries and (
+            self._size > self.max_bytes or len(self._entries) > self.max_entries
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.waits
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "waits": self.waits,
+                "evictions": self.evictions,
+                "inflight": len(self._inflight),
+                "hit_ratio": round((self.hits + self.waits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class _Flight:
+    __slots__ = ("event", "result", "error", "cond", "chunks")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        # Morceaux déjà produits par un leader en streaming
+        self.cond = threading.Condition()
+        self.chunks = []
+
+
+class _Abandoned(Exception):
+    """
+    Le leader d'un rendu en streaming s'est arrêté avant la fin.
+    """
+
+
+# ============================
+# FENÊTRE GLISSANTE DE FRAMES
+# ============================
+# Une frame ne dépend que de (config, secondes restantes). Le GIF de la
+# seconde t+1 partage donc loop_duration-1 frames avec celui de t : on les
+# garde par countdown, indexées par le nombre de secondes restantes.
+
+class FrameWindow:
+    """
+    Frames déjà rendues (mode "P") d'un countdown, indexées par secondes
+    restantes. Les frames au-dessus de la fenêtre courante sont obsolètes
+    (le temps ne fait que décroître) et sont purgées à chaque rendu.
+    """
+
+    def __init__(self, max_frames: int = 120, store=None):
+        self.max_frames = max_frames
+        self._lock = threading.Lock()
+        self._frames = {}
+        self.nbytes = 0   # somme des w*h*bandes des frames gardées
+        self._store = store
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, remaining: int):
+        with self._lock:
+            frame = self._frames.get(remaining)
+            if frame is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return frame
+
+    def put(self, remaining: int, frame):
+        with self._lock:
+            old = self._frames.get(remaining)
+            if old is not None:
+                self.nbytes -= _frame_bytes(old)
+            self._frames[remaining] = frame
+            self.nbytes += _frame_bytes(frame)
+            if len(self._frames) > self.max_frames:
+                # On garde les plus petits "remaining" = les plus récents
+                for k in sorted(self._frames, reverse=True)[: len(self._frames) - self.max_frames]:
+                    self.nbytes -= _frame_bytes(self._frames.pop(k))
+        if self._store is not None:
+            self._store.trim()
+
+    def prune_above(self, remaining: int):
+        with self._lock:
+            for k in [k for k in self._frames if k > remaining]:
+                self.nbytes -= _frame_bytes(self._frames.pop(k))
+
+    def __len__(self):
+        return len(self._frames)
+
+
+def _frame_bytes(frame) -> int:
+    return frame.width * frame.height * len(frame.getbands())
+
+
+class FrameStore:
+    """
+    LRU de FrameWindow, une par (countdown_id, hash de config), borné en
+    nombre de countdowns et en octets (somme des frames de toutes les
+    fenêtres) : 128 x 120 frames en 1200x600 dépasseraient 10 Go.
+    """
+
+    def __init__(self, max_countdowns: int = 128, max_frames: int = 120,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.max_countdowns = max_countdowns
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._windows = OrderedDict()
+        self.evictions = 0
+
+    def window(self, key) -> FrameWindow:
+        with self._lock:
+            win = self._windows.get(key)
+            if win is None:
+                win = FrameWindow(self.max_frames, store=self)
+                self._windows[key] = win
+                while len(self._windows) > self.max_countdowns:
+                    self._windows.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._windows.move_to_end(key)
+            return win
+
+    def trim(self):
+        """
+        Évince les fenêtres les moins récentes tant que le total dépasse
+        max_bytes (appelé après chaque ajout de frame). La plus récente
+        reste, même seule au-dessus du budget.
+        """
+        with self._lock:
+            total = sum(w.nbytes for w in self._windows.values())
+            while len(self._windows) > 1 and total > self.max_bytes:
+                _, win = self._windows.popitem(last=False)
+                total -= win.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            windows = list(self._windows.values())
+            evictions = self.evictions
+        hits = sum(w.hits for w in windows)
+        misses = sum(w.misses for w in windows)
+        return {
+            "countdowns": len(windows),
+            "frames": sum(len(w) for w in windows),
+            "bytes": sum(w.nbytes for w in windows),
+            "max_bytes": self.max_bytes,
+            "max_countdowns": self.max_countdowns,
+            "max_frames": self.max_frames,
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
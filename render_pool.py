@@ -0,0 +1,148 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from countdown_config import CountdownConfig
+
+
+# ============================
+# POOL DE RENDU DE FRAMES
+# ============================
+# Répartit les frames d'un GIF sur un pool de processus (polices
+# préchargées dans chaque process). Deux garde-fous :
+#  - `max_pending` : nombre total de paquets en vol dans le pool ; au-delà,
+#    le paquet est rendu dans le thread appelant (backpressure, pas d'attente).
+#  - `max_per_gif` : un même GIF n'occupe jamais plus de N paquets à la fois,
+#    pour qu'un gros GIF n'affame pas les autres requêtes (défaut : tout le
+#    pool, un GIF seul profite de tous les process).
+# Pendant que ses paquets tournent dans le pool, le thread appelant rend
+# lui aussi le paquet suivant au lieu d'attendre : workers + 1 paquets
+# avancent en parallèle.
+
+def _init_worker(preload_cfg):
+    import renderer_gif
+    if preload_cfg:
+        renderer_gif.preload_fonts(preload_cfg)
+
+
+def _render_chunk(cfg, remainings):
+    import metrics
+    import renderer_gif
+    frames = [renderer_gif.render_frame(cfg, r) for r in remainings]
+    metrics.REGISTRY.maybe_flush()
+    return frames
+
+
+class FramePool:
+
+    def __init__(self, workers: int, max_pending: int = None, max_per_gif: int = None,
+                 chunk_size: int = 4, preload_cfg: CountdownConfig = None):
+        self.workers = workers
+        self.max_pending = max_pending or workers * 2
+        self.max_per_gif = max_per_gif or workers
+        self.chunk_size = max(1, chunk_size)
+        self.preload_cfg = preload_cfg
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+        self.chunks_pooled = 0
+        self.chunks_inline = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.preload_cfg,),
+                )
+            return self._executor
+
+    def render_frames(self, cfg: CountdownConfig, remainings: list) -> list:
+        """
+        Rend les frames de `remainings` et les renvoie dans le même ordre.
+        """
+        chunks = [
+            remainings[i:i + self.chunk_size]
+            for i in range(0, len(remainings), self.chunk_size)
+        ]
+        results = [None] * len(chunks)
+        executor = self._get_executor()
+
+        pending = {}  # future -> index du paquet
+        next_chunk = 0
+        try:
+            while next_chunk < len(chunks) or pending:
+                # Remplit jusqu'au plafond par GIF
+                while next_chunk < len(chunks) and len(pending) < self.max_per_gif:
+                    idx = next_chunk
+                    next_chunk += 1
+                    if self._slots.acquire(blocking=False):
+                        try:
+                            future = executor.submit(_render_chunk, cfg, chunks[idx])
+                        except BaseException:
+                            self._slots.release()
+                            raise
+                        future.add_done_callback(lambda _f: self._slots.release())
+                        pending[future] = idx
+                        self.chunks_pooled += 1
+                    else:
+                        # Pool saturé : on rend ce paquet ici
+                        results[idx] = _render_chunk(cfg, chunks[idx])
+                        self.chunks_inline += 1
+
+                if next_chunk < len(chunks) and pending:
+                    # Plafond atteint : le thread appelant prend le suivant
+                    idx = next_chunk
+                    next_chunk += 1
+                    results[idx] = _render_chunk(cfg, chunks[idx])
+                    self.chunks_inline += 1
+                    done = [future for future in pending if future.done()]
+                elif pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                else:
+                    done = ()
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+        return [frame for chunk in results for frame in chunk]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "max_per_gif": self.max_per_gif,
+            "chunk_size": self.chunk_size,
+            "chunks_pooled": self.chunks_pooled,
+            "chunks_inline": self.chunks_inline,
+        }
+
+
+def from_env(preload_cfg: CountdownConfig = None):
+    """
+    Pool configuré par l'environnement ; None si RENDER_POOL_WORKERS=0
+    (défaut : rendu séquentiel dans le thread de la requête).
+    """
+    workers = int(os.environ.get("RENDER_POOL_WORKERS", "0"))
+    if workers <= 0:
+        return None
+    return FramePool(
+        workers,
+        max_pending=int(os.environ.get("RENDER_POOL_MAX_PENDING", "0")) or None,
+        max_per_gif=int(os.environ.get("RENDER_POOL_MAX_PER_GIF", "0")) or None,
+        chunk_size=int(os.environ.get("RENDER_POOL_CHUNK", "4")),
+        preload_cfg=preload_cfg,
+    )
@@ -1,23 +1,83 @@
+import os
+import weakref
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from io import BytesIO
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import GifImagePlugin, Image, ImageChops, ImageDraw
 
+import fonts
+import gif_palette
+import metrics
+import ring_raster
+from countdown_config import CountdownConfig
+from glyph_atlas import blit_text
 
-FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
-FONT_PATH_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
-SCALE = 4  # supersampling x4
+
+# À incrémenter à chaque changement visible du rendu ou de l'encodage
+# (entre dans les ETag : les caches HTTP ne servent pas d'anciens GIF)
+RENDERER_VERSION = "15"
+
+SCALE = 4  # supersampling x4 (qualité "4x", historique)
+
+# Qualité de rendu -> (facteur de supersampling du canvas, facteur des arcs)
+# "auto" : canvas natif (antialiasing Pillow pour le texte), seuls les
+# arcs du template circular sont supersamplés.
+QUALITY_MODES = {
+    "native": (1, None),
+    "2x": (2, None),
+    "4x": (SCALE, None),
+    "auto": (1, SCALE),
+}
+DEFAULT_QUALITY = "4x"
+
+
+def quality_scales(cfg: CountdownConfig):
+    """
+    (scale du canvas, scale des arcs ou None) pour la qualité de la config.
+    """
+    quality = cfg.render_quality or DEFAULT_QUALITY
+    scale, arc_scale = QUALITY_MODES.get(quality, QUALITY_MODES[DEFAULT_QUALITY])
+    if cfg.template == "basic":
+        arc_scale = None
+    return scale, arc_scale
 
 
 def _load_font(px_size: int, bold: bool = False):
     """
-    Charge une police normale ou bold.
+    Charge une police normale ou bold (via le registre partagé).
     """
-    try:
-        path = FONT_PATH_BOLD if bold else FONT_PATH
-        return ImageFont.truetype(path, px_size)
-    except Exception:
-        return ImageFont.load_default()
+    return fonts.get_font(px_size, bold=bold)
+
+
+def preload_fonts(cfg: CountdownConfig):
+    """
+    Précharge les tailles utilisées par une config (chiffres, préfixe, labels).
+    """
+    scale, _ = quality_scales(cfg)
+    sizes = {
+        cfg.font_size * scale,
+        int(cfg.font_size * 0.6) * scale,
+        cfg.circular_label_size * scale,
+        cfg.basic_label_size * scale,
+    }
+    fonts.preload(sorted(sizes))
+
+
+def warm(cfg: CountdownConfig):
+    """
+    Prépare tout ce qui ne dépend que de la config : polices, couche
+    statique, palette, et tuiles "00".."59" de chaque unité à leur
+    position sub-pixel réelle (une frame par valeur).
+    """
+    preload_fonts(cfg)
+    scale, _ = quality_scales(cfg)
+    for k in range(60):
+        # J 0..29, H 0..23, M et S 0..59 (k = 0 : frame "Terminé")
+        remaining = (k % 30) * 86400 + (k % 24) * 3600 + k * 60 + k
+        _draw_frame(cfg, remaining, scale)
+    render_frame(cfg, remaining)
 
 
 def _text_size(draw: ImageDraw.ImageDraw, text: str, font):
@@ -57,43 +117,58 @@ def _lighten_color(hex_color: str, factor: float = 0.6) -> str:
 # BASIC TEMPLATE
 # ============================
 
-def _draw_basic_frame(draw, cfg, days, hours, minutes, seconds):
-    W = cfg["width"] * SCALE
-    H = cfg["height"] * SCALE
+def _draw_prefix(draw, cfg, W, y_fn, scale):
+    prefix = cfg.message_prefix
+    if not prefix:
+        return
+    prefix_bold = cfg.prefix_bold
+    prefix_font = _load_font(int(cfg.font_size * 0.6) * scale, bold=prefix_bold)
+    tw, th = _text_size(draw, prefix, prefix_font)
+    draw.text(
+        ((W - tw) // 2, y_fn(th)),
+        prefix,
+        font=prefix_font,
+        fill=cfg.text_color,
+    )
 
-    font_bold = bool(cfg.get("font_bold", False))
-    label_bold = bool(cfg.get("label_bold", False))
-    prefix_bold = bool(cfg.get("prefix_bold", False))
 
-    main_font = _load_font(cfg["font_size"] * SCALE, bold=font_bold)
-    label_font = _load_font(cfg["basic_label_size"] * SCALE, bold=label_bold)
+def _draw_basic_static(draw, cfg, scale):
+    """
+    Couche invariante du template basic : le préfixe.
+    """
+    W = cfg.width * scale
+    _draw_prefix(draw, cfg, W, lambda th: 18 * scale, scale)
 
-    units = [("J", days), ("H", hours), ("M", minutes), ("S", seconds)]
-    gap = cfg["basic_gap"] * SCALE
-    show_labels = cfg["show_labels"]
 
-    # Préfixe
-    prefix = cfg.get("message_prefix") or ""
-    if prefix:
-        prefix_font = _load_font(int(cfg["font_size"] * 0.6) * SCALE, bold=prefix_bold)
-        tw, th = _text_size(draw, prefix, prefix_font)
-        draw.text(
-            ((W - tw) // 2, 18 * SCALE),
-            prefix,
-            font=prefix_font,
-            fill=cfg["text_color"],
-        )
+def _draw_basic_dynamic(img, cfg, values, measure, scale):
+    """
+    Blocs valeur + label. Les positions dépendent de la largeur de chaque
+    valeur (bbox réelle), donc la rangée entière est redessinée ; seules
+    les mesures sont mémorisées via `measure`.
+    """
+    W = cfg.width * scale
+    H = cfg.height * scale
+
+    font_bold = cfg.font_bold
+    label_bold = cfg.label_bold
+
+    main_font = _load_font(cfg.font_size * scale, bold=font_bold)
+    label_font = _load_font(cfg.basic_label_size * scale, bold=label_bold)
+
+    units = [("J", values[0]), ("H", values[1]), ("M", values[2]), ("S", values[3])]
+    gap = cfg.basic_gap * scale
+    show_labels = cfg.show_labels
 
     # Mesure des blocs
     blocks = []
-    between = 18 * SCALE
+    between = 18 * scale
     total_w = 0
 
     for label, val in units:
         val_txt = f"{val:02}"
-        tw, th = _text_size(draw, val_txt, main_font)
+        tw, th = measure(val_txt, main_font)
         if show_labels:
-            lw, lh = _text_size(draw, label, label_font)
+            lw, lh = measure(label, label_font)
         else:
             lw = lh = 0
         bw = max(tw, lw)
@@ -111,7 +186,7 @@ def _draw_basic_frame(draw, cfg, days, hours, minutes, seconds):
         })
 
     total_w += between * (len(blocks) - 1)
-    center_y = H // 2 + 10 * SCALE
+    center_y = H // 2 + 10 * scale
     x = (W - total_w) // 2
 
     for b in blocks:
@@ -121,18 +196,13 @@ def _draw_basic_frame(draw, cfg, days, hours, minutes, seconds):
         # valeur
         vx = x + (bw - b["tw"]) // 2
         vy = top
-        draw.text((vx, vy), b["val"], font=main_font, fill=cfg["text_color"])
+        blit_text(img, (vx, vy), b["val"], main_font, cfg.text_color)
 
         # label
         if show_labels:
             lx = x + (bw - b["lw"]) // 2
             ly = vy + b["th"] + gap
-            draw.text(
-                (lx, ly),
-                b["label"],
-                font=label_font,
-                fill=cfg["basic_label_color"],
-            )
+            blit_text(img, (lx, ly), b["label"], label_font, cfg.basic_label_color)
 
         x += bw + between
 
@@ -141,169 +211,599 @@ def _draw_basic_frame(draw, cfg, days, hours, minutes, seconds):
 # CIRCULAR (version PRO avec glow)
 # ============================
 
-def _draw_circular_frame(draw, cfg, days, hours, minutes, seconds):
-    W = cfg["width"] * SCALE
-    H = cfg["height"] * SCALE
+def _circular_geometry(cfg, scale) -> dict:
+    W = cfg.width * scale
+    H = cfg.height * scale
 
-    base_color = cfg["circular_base_color"]
-    progress_color = cfg["circular_progress_color"]
-    thickness = max(1, cfg["circular_thickness"] * SCALE)
-    spacing = cfg["circular_spacing"] * SCALE
+    thickness = max(1, cfg.circular_thickness * scale)
+    spacing = cfg.circular_spacing * scale
 
-    # Circular Pro = glow activé
-    is_pro = True  # on remplace complètement l'ancien circular par la version "pro"
-
-    units = [("J", days, 30), ("H", hours, 24),
-             ("M", minutes, 60), ("S", seconds, 60)]
-
-    padding = 40 * SCALE
+    padding = 40 * scale
     available_w = W - padding * 2
     count = 4
     radius = int((available_w - (count - 1) * spacing) / (count * 2))
-    radius = max(radius, 20 * SCALE)
+    radius = max(radius, 20 * scale)
 
-    center_y = H // 2 + 4 * SCALE
+    center_y = H // 2 + 4 * scale
 
-    font_bold = bool(cfg.get("font_bold", False))
-    label_bold = bool(cfg.get("label_bold", False))
-    prefix_bold = bool(cfg.get("prefix_bold", False))
+    total_width = count * (2 * radius) + (count - 1) * spacing
+    start_x = (W - total_width) // 2
 
-    font_main = _load_font(cfg["font_size"] * SCALE, bold=font_bold)
-    font_label = _load_font(cfg["circular_label_size"] * SCALE, bold=label_bold)
+    return {
+        "scale": scale,
+        "W": W,
+        "H": H,
+        "thickness": thickness,
+        "radius": radius,
+        "center_y": center_y,
+        "centers": [start_x + radius + i * (2 * radius + spacing) for i in range(count)],
+    }
 
-    # Préfixe
-    prefix = cfg.get("message_prefix") or ""
-    if prefix:
-        prefix_font = _load_font(int(cfg["font_size"] * 0.6) * SCALE, bold=prefix_bold)
-        tw, th = _text_size(draw, prefix, prefix_font)
-        draw.text(
-            ((W - tw) // 2, center_y - radius - th - 8 * SCALE),
-            prefix,
-            font=prefix_font,
-            fill=cfg["text_color"],
-        )
 
-    total_width = count * (2 * radius) + (count - 1) * spacing
-    start_x = (W - total_width) // 2
+def _draw_circular_static(img, cfg, geo):
+    """
+    Couche invariante : préfixe, cercles de base et labels.
+    """
+    draw = ImageDraw.Draw(img)
+    scale = geo["scale"]
+    radius = geo["radius"]
+    cy = geo["center_y"]
+    label_bold = cfg.label_bold
+    font_label = _load_font(cfg.circular_label_size * scale, bold=label_bold)
 
-    for i, (label, value, max_value) in enumerate(units):
-        ratio = 0 if max_value <= 0 else max(0.0, min(value / max_value, 1.0))
-        cx = start_x + radius + i * (2 * radius + spacing)
-        cy = center_y
+    # Préfixe
+    _draw_prefix(draw, cfg, geo["W"], lambda th: cy - radius - th - 8 * scale, scale)
 
+    for label, cx in zip(("J", "H", "M", "S"), geo["centers"]):
         # cercle base
         draw.arc(
             (cx - radius, cy - radius, cx + radius, cy + radius),
             start=0, end=359,
-            fill=base_color,
-            width=thickness,
+            fill=cfg.circular_base_color,
+            width=geo["thickness"],
         )
 
-        # CIRCULAR PRO : halo derrière la progression
-        if is_pro:
-            glow_color = _lighten_color(progress_color, factor=0.6)
-            glow_width = int(thickness * 1.8)
-            end_angle_glow = -90 + 360 * ratio
-            draw.arc(
-                (cx - radius, cy - radius, cx + radius, cy + radius),
-                start=-90,
-                end=end_angle_glow,
-                fill=glow_color,
-                width=glow_width,
+        # label
+        if cfg.show_labels:
+            lbl = label.upper() if cfg.circular_label_uppercase else label
+            lw, lh = _text_size(draw, lbl, font_label)
+            blit_text(
+                img,
+                (cx - lw // 2, cy + radius + 8 * scale),
+                lbl,
+                font_label,
+                cfg.circular_label_color,
             )
 
-        # progression principale
-        end_angle = -90 + 360 * ratio
-        draw.arc(
-            (cx - radius, cy - radius, cx + radius, cy + radius),
-            start=-90,
-            end=end_angle,
-            fill=progress_color,
-            width=thickness,
-        )
 
-        # valeur (centrage propre avec bbox + baseline)
-        num_txt = f"{value:02}"
-        bbox = draw.textbbox((0, 0), num_txt, font=font_main)
-        tw = bbox[2] - bbox[0]
-        th = bbox[3] - bbox[1]
-        offset = bbox[1]  # ascender offset
-
-        draw.text(
-            (cx - tw / 2, cy - th / 2 - offset),
-            num_txt,
-            font=font_main,
-            fill=cfg["text_color"],
+def _draw_progress_arcs(draw, box, cfg, thickness, ratio):
+    progress_color = cfg.circular_progress_color
+    end_angle = -90 + 360 * ratio
+
+    # CIRCULAR PRO : halo derrière la progression
+    draw.arc(
+        box,
+        start=-90,
+        end=end_angle,
+        fill=_lighten_color(progress_color, factor=0.6),
+        width=int(thickness * 1.8),
+    )
+
+    # progression principale
+    draw.arc(box, start=-90, end=end_angle, fill=progress_color, width=thickness)
+
+
+def _ring_tile(cfg, geo, arc_scale):
+    """
+    Fond + cercle de base d'une unité, rendus à arc_scale fois la taille
+    native (mode "auto"). Identique pour les 4 unités.
+    """
+    side = (2 * geo["radius"] + 1) * arc_scale
+    tile = Image.new("RGB", (side, side), cfg.background_color)
+    ImageDraw.Draw(tile).arc(
+        (0, 0, side - 1, side - 1),
+        start=0, end=359,
+        fill=cfg.circular_base_color,
+        width=geo["thickness"] * arc_scale,
+    )
+    return tile
+
+
+def _paste_ring(patch, origin, cfg, ring, ratio):
+    """
+    Anneau analytique (cf. ring_raster) : fond, cercle de base, glow et
+    progression collés avec leurs masques de couverture.
+    """
+    side = ring.side
+    x, y = origin
+    patch.paste(cfg.background_color, (x, y, x + side, y + side))
+    patch.paste(cfg.circular_base_color, origin, ring.base_mask)
+    glow, progress = ring.masks(ratio)
+    if progress is not None:
+        patch.paste(_lighten_color(cfg.circular_progress_color, factor=0.6), origin, glow)
+        patch.paste(cfg.circular_progress_color, origin, progress)
+
+
+def _circular_unit_patch(static, cfg, geo, index, value, max_value, ring_tile=None, ring=None):
+    """
+    Patch (rectangle sale) d'une unité : glow + progression + valeur,
+    dessinés sur un extrait de la couche statique.
+    Avec `ring_tile` (mode "auto"), les arcs sont dessinés sur la tuile
+    supersamplée puis réduits avant d'être collés ; avec `ring`, ils sont
+    rasterisés directement à la taille native.
+    Renvoie ((x0, y0), image).
+    """
+    scale = geo["scale"]
+    radius = geo["radius"]
+    thickness = geo["thickness"]
+    cx = geo["centers"][index]
+    cy = geo["center_y"]
+
+    font_bold = cfg.font_bold
+    font_main = _load_font(cfg.font_size * scale, bold=font_bold)
+
+    num_txt = f"{value:02}"
+    bbox = font_main.getbbox(num_txt)
+    tw = bbox[2] - bbox[0]
+    th = bbox[3] - bbox[1]
+    offset = bbox[1]  # ascender offset
+    tx = cx - tw / 2
+    ty = cy - th / 2 - offset
+
+    # Rectangle sale = cercle ∪ encre du texte (+ marge d'antialiasing)
+    x0 = int(min(cx - radius, tx + bbox[0])) - 2
+    y0 = int(min(cy - radius, ty + bbox[1])) - 2
+    x1 = int(max(cx + radius, tx + bbox[2])) + 3
+    y1 = int(max(cy + radius, ty + bbox[3])) + 3
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1, geo["W"]), min(y1, geo["H"])
+
+    patch = static.crop((x0, y0, x1, y1))
+    lcx, lcy = cx - x0, cy - y0
+
+    ratio = 0 if max_value <= 0 else max(0.0, min(value / max_value, 1.0))
+
+    if ring is not None:
+        _paste_ring(patch, (lcx - radius, lcy - radius), cfg, ring, ratio)
+    elif ring_tile is None:
+        box = (lcx - radius, lcy - radius, lcx + radius, lcy + radius)
+        _draw_progress_arcs(ImageDraw.Draw(patch), box, cfg, thickness, ratio)
+    else:
+        arc_scale = ring_tile.width // (2 * radius + 1)
+        big = ring_tile.copy()
+        _draw_progress_arcs(
+            ImageDraw.Draw(big),
+            (0, 0, big.width - 1, big.height - 1),
+            cfg,
+            thickness * arc_scale,
+            ratio,
         )
+        side = 2 * radius + 1
+        patch.paste(big.resize((side, side), Image.LANCZOS), (lcx - radius, lcy - radius))
 
-        # label
-        if cfg["show_labels"]:
-            lbl = label.upper() if cfg["circular_label_uppercase"] else label
-            lw, lh = _text_size(draw, lbl, font_label)
-            draw.text(
-                (cx - lw // 2, cy + radius + 8 * SCALE),
-                lbl,
-                font=font_label,
-                fill=cfg["circular_label_color"],
+    # valeur (centrage propre avec bbox + baseline)
+    blit_text(patch, (tx - x0, ty - y0), num_txt, font_main, cfg.text_color)
+
+    return (x0, y0), patch
+
+
+# ============================
+# RENDU EN COUCHES
+# ============================
+# La couche invariante (fond, préfixe, cercles de base, labels) est
+# rasterisée une fois par config ; chaque frame = copie de cette couche
+# + un patch par unité. Les patchs J/H/M changent rarement : on garde le
+# dernier de chaque unité et on ne redessine que "S" la plupart du temps.
+
+class _LayeredRenderer:
+
+    def __init__(self, cfg: CountdownConfig):
+        self.cfg = cfg
+        self.template = cfg.template
+        self.scale, arc_scale = quality_scales(cfg)
+        self.size = (cfg.width * self.scale, cfg.height * self.scale)
+
+        self.static = Image.new("RGB", self.size, cfg.background_color)
+        self.ring_tile = None
+        self.ring = None
+        if self.template == "basic":
+            _draw_basic_static(ImageDraw.Draw(self.static), cfg, self.scale)
+        else:
+            self.geo = _circular_geometry(cfg, self.scale)
+            _draw_circular_static(self.static, cfg, self.geo)
+            if arc_scale and ring_raster.ENABLED:
+                self.ring = ring_raster.ring(self.geo["radius"], self.geo["thickness"])
+            elif arc_scale:
+                self.ring_tile = _ring_tile(cfg, self.geo, arc_scale)
+
+        self._lock = threading.Lock()
+        self._patches = {}   # index -> (value, origin, patch)
+        self._extents = {}   # index -> union des rectangles de ses patchs
+        self._sizes = {}     # (text, police, taille) -> (w, h)
+
+    def _measure(self, text, font):
+        key = (text, getattr(font, "path", None), getattr(font, "size", None))
+        size = self._sizes.get(key)
+        if size is None:
+            bbox = font.getbbox(text)
+            size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+            self._sizes[key] = size
+        return size
+
+    def _patch(self, index, value, max_value):
+        with self._lock:
+            cached = self._patches.get(index)
+        if cached is not None and cached[0] == value:
+            return cached[1], cached[2]
+        origin, patch = _circular_unit_patch(
+            self.static, self.cfg, self.geo, index, value, max_value, self.ring_tile, self.ring
+        )
+        box = (origin[0], origin[1], origin[0] + patch.width, origin[1] + patch.height)
+        with self._lock:
+            self._patches[index] = (value, origin, patch)
+            old = self._extents.get(index, box)
+            self._extents[index] = (
+                min(old[0], box[0]), min(old[1], box[1]), max(old[2], box[2]), max(old[3], box[3])
+            )
+        return origin, patch
+
+    def render(self, days, hours, minutes, seconds) -> Image.Image:
+        """
+        Frame dans une nouvelle image (que l'appelant peut garder).
+        """
+        return self.render_into(self.static.copy(), days, hours, minutes, seconds, clean=True)
+
+    def render_into(self, canvas, days, hours, minutes, seconds, clean=False) -> Image.Image:
+        """
+        Frame dessinée dans `canvas` (taille de la couche statique), sans
+        allocation. clean=True : le canvas contient déjà une frame de cette
+        config ; en circular, les patchs recouvrent alors toute la partie
+        variable et la couche statique n'est pas recopiée.
+        """
+        if not clean or self.template == "basic":
+            canvas.paste(self.static)
+        if self.template == "basic":
+            _draw_basic_dynamic(
+                canvas, self.cfg, (days, hours, minutes, seconds), self._measure, self.scale
             )
+        else:
+            units = ((days, 30), (hours, 24), (minutes, 60), (seconds, 60))
+            for i, (value, max_value) in enumerate(units):
+                origin, patch = self._patch(i, value, max_value)
+                if clean:
+                    # Patch plus petit qu'un précédent (texte plus étroit
+                    # qui débordait du cercle) : on efface l'ancien
+                    extent = self._extents[i]
+                    if (origin[0], origin[1], origin[0] + patch.width, origin[1] + patch.height) != extent:
+                        canvas.paste(self.static.crop(extent), extent[:2])
+                canvas.paste(patch, origin)
+        return canvas
+
+
+# LRU borné en octets (cf. GlyphAtlas, RenderCache) : une couche 4x en
+# 1200x600 pèse 35 Mo, une couche 1x en 300x100 moins de 100 Ko
+_LAYERS_MAX_BYTES = int(os.environ.get("GIF_LAYER_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+_layers = OrderedDict()   # digest -> (renderer, octets)
+_layers_size = 0
+_layers_lock = threading.Lock()
+
+
+def _layer_bytes(renderer: _LayeredRenderer) -> int:
+    # Couche statique RGB (width*height*scale² * 3) + tuile d'anneau 4x
+    size = renderer.size[0] * renderer.size[1] * 3
+    if renderer.ring_tile is not None:
+        size += renderer.ring_tile.width * renderer.ring_tile.height * 3
+    return size
+
+
+def _layered_renderer(cfg: CountdownConfig) -> _LayeredRenderer:
+    """
+    Un renderer en couches par config (LRU borné à
+    GIF_LAYER_CACHE_MAX_BYTES ; la dernière couche est toujours gardée).
+    """
+    global _layers_size
+    key = cfg.digest
+    with _layers_lock:
+        entry = _layers.get(key)
+        if entry is not None:
+            _layers.move_to_end(key)
+            return entry[0]
+
+    renderer = _LayeredRenderer(cfg)
+    size = _layer_bytes(renderer)
+    with _layers_lock:
+        if key not in _layers:
+            _layers[key] = (renderer, size)
+            _layers_size += size
+            while len(_layers) > 1 and _layers_size > _LAYERS_MAX_BYTES:
+                _, (_, old) = _layers.popitem(last=False)
+                _layers_size -= old
+    return renderer
+
+
+def clear_layers():
+    global _layers_size
+    with _layers_lock:
+        _layers.clear()
+        _layers_size = 0
+
+
+# ============================
+# CANVAS DE TRAVAIL
+# ============================
+# Un canvas supersamplé par thread, réutilisé de frame en frame (et de
+# GIF en GIF) au lieu d'une copie de la couche statique par frame : en 4x
+# 1200x600, 35 Mo alloués puis libérés à chaque frame. La frame est
+# réduite et quantifiée aussitôt ; seule la frame "P" native est gardée.
+
+_canvases = threading.local()
+
+
+def _thread_canvas(renderer: "_LayeredRenderer"):
+    """
+    (canvas du thread courant à la taille du renderer, True s'il contient
+    déjà une frame de CE renderer). Clé = l'instance, pas le digest : un
+    renderer reconstruit après éviction du LRU a des _extents vides qui
+    ne couvrent pas les patchs restés sur le canvas.
+    """
+    slot = getattr(_canvases, "slot", None)
+    if slot is not None and slot[1].size == renderer.size:
+        owner, canvas = slot
+        clean = owner() is renderer
+    else:
+        _canvases.slot = None  # l'ancien canvas est libéré avant d'allouer
+        canvas = Image.new("RGB", renderer.size)
+        clean = False
+    # Référence faible : le canvas ne retient pas un renderer évincé
+    _canvases.slot = (weakref.ref(renderer), canvas)
+    return canvas, clean
 
 
 # ============================
 # GÉNÉRATION DU GIF COMPLET
 # ============================
 
-def generate_gif(cfg: dict, end_time: datetime) -> BytesIO:
-    now = datetime.utcnow()
-    loop_duration = int(cfg.get("loop_duration", 20))
+def render_frame_rgb(cfg: CountdownConfig, remaining: int) -> Image.Image:
+    """
+    Rend une frame RGB à la taille finale pour un nombre de secondes
+    restantes donné. Ne dépend que de (cfg, remaining).
+    """
+    scale, _ = quality_scales(cfg)
 
-    frames = []
+    with metrics.span("draw"):
+        big = _draw_frame(cfg, remaining, scale)
 
-    for i in range(loop_duration):
-        current = now + timedelta(seconds=i)
-        remaining = int((end_time - current).total_seconds())
+    if scale == 1:
+        return big
+    with metrics.span("resize"):
+        return big.resize((cfg.width, cfg.height), Image.LANCZOS)
 
+
+def _draw_frame(cfg: CountdownConfig, remaining: int, scale: int, reuse: bool = False) -> Image.Image:
+    """
+    reuse=True : frame dessinée dans le canvas du thread (à consommer
+    avant la frame suivante du même thread).
+    """
+    if remaining <= 0:
         big = Image.new(
             "RGB",
-            (cfg["width"] * SCALE, cfg["height"] * SCALE),
-            cfg["background_color"],
+            (cfg.width * scale, cfg.height * scale),
+            cfg.background_color,
         )
         draw = ImageDraw.Draw(big)
-
-        font_bold = bool(cfg.get("font_bold", False))
-
-        if remaining <= 0:
-            txt = "⏰ Terminé !"
-            font_big = _load_font(cfg["font_size"] * SCALE, bold=font_bold)
-            tw, th = _text_size(draw, txt, font_big)
-            draw.text(
-                ((cfg["width"] * SCALE - tw) // 2, (cfg["height"] * SCALE - th) // 2),
-                txt,
-                font=font_big,
-                fill=cfg["text_color"],
-            )
+        font_bold = cfg.font_bold
+        txt = "⏰ Terminé !"
+        font_big = _load_font(cfg.font_size * scale, bold=font_bold)
+        tw, th = _text_size(draw, txt, font_big)
+        blit_text(
+            big,
+            ((cfg.width * scale - tw) // 2, (cfg.height * scale - th) // 2),
+            txt,
+            font_big,
+            cfg.text_color,
+        )
+    else:
+        total_sec = remaining
+        days, rem = divmod(total_sec, 86400)
+        hours, rem = divmod(rem, 3600)
+        minutes, seconds = divmod(rem, 60)
+        renderer = _layered_renderer(cfg)
+        if reuse:
+            canvas, clean = _thread_canvas(renderer)
+            big = renderer.render_into(canvas, days, hours, minutes, seconds, clean=clean)
         else:
-            total_sec = remaining
-            days, rem = divmod(total_sec, 86400)
-            hours, rem = divmod(rem, 3600)
-            minutes, seconds = divmod(rem, 60)
-
-            template = cfg.get("template", "circular")
-            if template == "basic":
-                _draw_basic_frame(draw, cfg, days, hours, minutes, seconds)
+            big = renderer.render(days, hours, minutes, seconds)
+    return big
+
+
+def render_frame(cfg: CountdownConfig, remaining: int) -> Image.Image:
+    """
+    Frame prête pour l'encodeur : quantifiée en "P" avec la palette
+    globale de la config (cf. gif_palette), dessinée dans le canvas de
+    travail du thread (aucune image RGB ne survit à l'appel).
+    """
+    scale, _ = quality_scales(cfg)
+
+    with metrics.span("draw"):
+        frame = _draw_frame(cfg, remaining, scale, reuse=True)
+
+    if scale != 1:
+        with metrics.span("resize"):
+            frame = frame.resize((cfg.width, cfg.height), Image.LANCZOS)
+    with metrics.span("quantize"):
+        return gif_palette.quantize(frame, cfg)
+
+
+# En dessous de ce nombre de frames à rendre, le pool ne vaut pas
+# l'aller-retour (pickle des images entre processus).
+POOL_MIN_FRAMES = int(os.environ.get("RENDER_POOL_MIN_FRAMES", "8"))
+
+
+def _frame_remainings(cfg: CountdownConfig, end_time: datetime, now: datetime, frames_window=None):
+    loop_duration = cfg.loop_duration
+
+    start_remaining = int((end_time - now).total_seconds())
+    if frames_window is not None:
+        frames_window.prune_above(max(start_remaining, 0))
+
+    remainings = []
+    for i in range(loop_duration):
+        current = now + timedelta(seconds=i)
+        remaining = int((end_time - current).total_seconds())
+        # Toutes les frames "Terminé" sont identiques
+        remainings.append(max(remaining, 0))
+    return remainings
+
+
+def use_transparency(cfg: CountdownConfig) -> bool:
+    """
+    Transparence des pixels inchangés dans les frames delta : gagnant pour
+    circular (anneaux immobiles dans le rectangle des secondes), perdant
+    pour basic (les blocs se décalent, la transparence casse les plages LZW).
+    """
+    return cfg.template != "basic"
+
+
+def generate_gif(cfg: CountdownConfig, end_time: datetime, now: datetime = None,
+                 frames_window=None, pool=None) -> BytesIO:
+    """
+    `now` permet de fixer la seconde de départ (utile pour le cache :
+    même seconde + même config = même GIF).
+
+    `frames_window` (optionnel, cf. render_cache.FrameWindow) permet de
+    réutiliser les frames déjà rendues par les requêtes précédentes :
+    en régime établi, une seule nouvelle frame par seconde.
+
+    `pool` (optionnel, cf. render_pool.FramePool) répartit les frames
+    manquantes sur des processus quand il y en a assez.
+    """
+    if now is None:
+        now = datetime.utcnow()
+    remainings = _frame_remainings(cfg, end_time, now, frames_window)
+
+    rendered = {}
+    if frames_window is not None:
+        for remaining in remainings:
+            frame = frames_window.get(remaining)
+            if frame is not None:
+                rendered[remaining] = frame
+
+    missing = [r for r in dict.fromkeys(remainings) if r not in rendered]
+    if pool is not None and len(missing) >= POOL_MIN_FRAMES:
+        new_frames = zip(missing, pool.render_frames(cfg, missing))
+    else:
+        new_frames = ((r, render_frame(cfg, r)) for r in missing)
+
+    for remaining, frame in new_frames:
+        rendered[remaining] = frame
+        if frames_window is not None:
+            frames_window.put(remaining, frame)
+
+    frames = [rendered[r] for r in remainings]
+
+    with metrics.span("encode"):
+        data = encode_gif(frames, transparency=use_transparency(cfg))
+
+    metrics.inc("countdown_gif_renders_total", template=cfg.template)
+    metrics.inc("countdown_gif_frames_rendered_total", len(missing))
+    metrics.inc("countdown_gif_frames_reused_total", len(remainings) - len(missing))
+    metrics.inc("countdown_gif_bytes_total", data.getbuffer().nbytes)
+    return data
+
+
+def iter_gif(cfg: CountdownConfig, end_time: datetime, now: datetime = None, frames_window=None):
+    """
+    Version streaming de generate_gif : produit l'en-tête (palette
+    globale comprise) dès la 1re frame, puis chaque frame delta au fil du
+    rendu. En mémoire : la frame courante et la précédente, jamais le GIF.
+    """
+    if now is None:
+        now = datetime.utcnow()
+
+    def frames():
+        for remaining in _frame_remainings(cfg, end_time, now, frames_window):
+            frame = frames_window.get(remaining) if frames_window is not None else None
+            if frame is None:
+                frame = render_frame(cfg, remaining)
+                metrics.inc("countdown_gif_frames_rendered_total")
+                if frames_window is not None:
+                    frames_window.put(remaining, frame)
             else:
-                _draw_circular_frame(draw, cfg, days, hours, minutes, seconds)
+                metrics.inc("countdown_gif_frames_reused_total")
+            yield frame
+
+    metrics.inc("countdown_gif_renders_total", template=cfg.template)
+    return _iter_encoded(frames(), use_transparency(cfg))
+
+
+def _indices(frame: Image.Image) -> Image.Image:
+    # Vue "L" des index de palette (sans passer par les couleurs)
+    return Image.frombytes("L", frame.size, frame.tobytes())
+
+
+def _mask_unchanged(frame: Image.Image, diff: Image.Image) -> Image.Image:
+    # Pixels à diff nulle -> index transparent réservé par gif_palette
+    index = frame.info["transparency"]
+    delta = frame.copy()
+    delta.paste(index, mask=diff.point(lambda v: 255 if v == 0 else 0))
+    delta.info["transparency"] = index
+    return delta
+
+
+def _delta(prev: Image.Image, frame: Image.Image, transparency: bool):
+    """
+    Rectangle de `frame` qui diffère de `prev` -> (image rognée, offset),
+    ou (None, None) si rien n'a changé.
+    """
+    diff = ImageChops.difference(_indices(frame), _indices(prev))
+    bbox = diff.getbbox()
+    if bbox is None:
+        return None, None
+    if transparency and "transparency" in frame.info:
+        frame = _mask_unchanged(frame, diff)
+    delta = frame.crop(bbox)
+    delta.info.update(frame.info)
+    return delta, bbox[:2]
+
+
+def _iter_encoded(frames, transparency: bool):
+    """
+    Écrit le GIF morceau par morceau : en-tête + palette globale (celle de
+    la 1re frame, partagée par toutes), puis pour chaque frame suivante
+    seulement le rectangle qui a changé, disposal=1 ("ne pas effacer").
+    """
+    prev = None
+    for frame in frames:
+        params = {"duration": 1000, "disposal": 1}
+        if prev is None:
+            header, _ = GifImagePlugin.getheader(frame.copy(), None, {"loop": 0, **params})
+            yield b"".join(header)
+            # Copie : getdata() pose puis retire encoderinfo sur l'image,
+            # et la frame est partagée (FrameWindow) avec d'autres threads
+            image, offset = frame.copy(), (0, 0)
+        else:
+            image, offset = _delta(prev, frame, transparency)
+            if image is None:
+                # Frame identique : on garde sa seconde d'affichage
+                image, offset = frame.crop((0, 0, 1, 1)), (0, 0)
+            elif transparency and "transparency" in image.info:
+                params["transparency"] = image.info["transparency"]
+
+        yield b"".join(GifImagePlugin.getdata(image, offset, **params))
+        prev = frame
 
-        final = big.resize((cfg["width"], cfg["height"]), Image.LANCZOS)
-        frames.append(final)
+    yield b";"
 
+
+def encode_gif(frames, transparency: bool = True) -> BytesIO:
+    """
+    Frames "P" partageant la même palette -> GIF avec une seule table de
+    couleurs globale et des frames delta (cf. _iter_encoded). Avec
+    `transparency`, les pixels inchangés à l'intérieur du rectangle passent
+    en transparent (cf. use_transparency).
+    """
     buf = BytesIO()
-    frames[0].save(
-        buf,
-        format="GIF",
-        save_all=True,
-        append_images=frames[1:],
-        duration=1000,
-        loop=0,
-    )
+    for chunk in _iter_encoded(frames, transparency):
+        buf.write(chunk)
     buf.seek(0)
-    return buf
\ No newline at end of file
+    return buf
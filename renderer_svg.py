@@ -1,6 +1,19 @@
+import os
 import math
+from functools import lru_cache
 from datetime import datetime, timedelta
 
+from countdown_config import CountdownConfig
+
+# À incrémenter à chaque changement du rendu (invalide les ETag)
+RENDERER_VERSION = "2"
+
+# Squelettes SVG mémorisés (un par config normalisée)
+SVG_MEMO_SIZE = int(os.environ.get("SVG_MEMO_SIZE", "256"))
+
+# Max de chaque unité pour l'anneau de progression (J plafonné à 30)
+_UNIT_MAX = (30, 24, 60, 60)
+
 def _esc(s: str) -> str:
     if s is None:
         return ""
@@ -11,42 +24,34 @@ def _esc(s: str) -> str:
         .replace(">", "&gt;")
     )
 
-def svg_preview(cfg: dict) -> str:
-    w = cfg["width"]
-    h = cfg["height"]
+# -----------------------------
+# Squelette : tout le SVG sauf les valeurs
+# -----------------------------
+# Un squelette est une liste de morceaux : chaînes fixes, ou emplacements
+# ("value", i) / ("dash", i, circ) remplis à chaque seconde. Les valeurs
+# et les anneaux portent des attributs data-* : la page de réglages
+# charge le SVG une fois puis met à jour chiffres et dasharray elle-même.
 
-    # -----------------------------
-    # 1) Récupération du temps restant
-    # -----------------------------
-    try:
-        end = datetime.fromisoformat(cfg["target_date"])
-    except Exception:
-        end = datetime.utcnow() + timedelta(days=3)
+@lru_cache(maxsize=SVG_MEMO_SIZE)
+def _skeleton(cfg: CountdownConfig):
+    w = cfg.width
+    h = cfg.height
 
-    now = datetime.utcnow()
-    remaining = int((end - now).total_seconds())
-    if remaining <= 0:
-        days = hours = minutes = seconds = 0
-    else:
-        days, rem = divmod(remaining, 86400)
-        hours, rem = divmod(rem, 3600)
-        minutes, seconds = divmod(rem, 60)
-
-    template = cfg.get("template", "circular")
-    prefix = cfg.get("message_prefix", "")
-    bg = cfg.get("background_color", "#FFFFFF")
-    text_color = cfg.get("text_color", "#111111")
-    show_labels = cfg.get("show_labels", True)
+    template = cfg.template
+    prefix = cfg.message_prefix
+    bg = cfg.background_color
+    text_color = cfg.text_color
+    show_labels = cfg.show_labels
 
     # Gras
-    prefix_weight = "700" if cfg.get("prefix_bold") else "500"
-    number_weight = "700" if cfg.get("font_bold") else "500"
-    label_weight = "700" if cfg.get("label_bold") else "500"
+    prefix_weight = "700" if cfg.prefix_bold else "500"
+    number_weight = "700" if cfg.font_bold else "500"
+    label_weight = "700" if cfg.label_bold else "500"
 
-    units = [("J", days), ("H", hours), ("M", minutes), ("S", seconds)]
+    labels = ["J", "H", "M", "S"]
 
     # -----------------------------
-    # 2) Structure SVG
+    # Structure SVG
     # -----------------------------
     svg = [
         f'<svg xmlns="http://www.w3.org/2000/svg" width="{w}" height="{h}" viewBox="0 0 {w} {h}">',
@@ -54,7 +59,7 @@ def svg_preview(cfg: dict) -> str:
     ]
 
     # -----------------------------
-    # 3) Préfixe
+    # Préfixe
     # -----------------------------
     if prefix:
         svg.append(
@@ -65,16 +70,16 @@ def svg_preview(cfg: dict) -> str:
         )
 
     # -----------------------------
-    # 4) TEMPLATE CIRCULAR
+    # TEMPLATE CIRCULAR
     # -----------------------------
     if template == "circular":
-        spacing = cfg["circular_spacing"]
-        base_color = cfg["circular_base_color"]
-        progress_color = cfg["circular_progress_color"]
-        label_color = cfg["circular_label_color"]
-        label_size = cfg["circular_label_size"]
-        uppercase = cfg["circular_label_uppercase"]
-        thickness = cfg["circular_thickness"]
+        spacing = cfg.circular_spacing
+        base_color = cfg.circular_base_color
+        progress_color = cfg.circular_progress_color
+        label_color = cfg.circular_label_color
+        label_size = cfg.circular_label_size
+        uppercase = cfg.circular_label_uppercase
+        thickness = cfg.circular_thickness
 
         padding = 40
         available_w = w - padding * 2
@@ -85,18 +90,10 @@ def svg_preview(cfg: dict) -> str:
 
         center_y = h / 2 + 4
 
-        max_days = 30
-        ratios = [
-            min(days / max_days, 1.0),
-            hours / 24,
-            minutes / 60,
-            seconds / 60,
-        ]
-
         total_width = count * (2 * radius) + (count - 1) * spacing
         start_x = (w - total_width) / 2
 
-        for i, ((label, val), ratio) in enumerate(zip(units, ratios)):
+        for i, label in enumerate(labels):
             cx = start_x + radius + i * (2 * radius + spacing)
             cy = center_y
 
@@ -108,23 +105,25 @@ def svg_preview(cfg: dict) -> str:
 
             # Progression
             circ = 2 * math.pi * radius
-            dash = max(0.0, min(ratio, 1.0)) * circ
-
-            svg.append(
-                f'<circle cx="{cx}" cy="{cy}" r="{radius}" '
+            svg.append((
+                f'<circle class="cd-progress" data-unit="{i}" data-max="{_UNIT_MAX[i]}" '
+                f'data-circ="{circ}" cx="{cx}" cy="{cy}" r="{radius}" '
                 f'stroke="{progress_color}" stroke-width="{thickness}" fill="none" '
-                f'stroke-dasharray="{dash} {circ - dash}" '
-                f'transform="rotate(-90 {cx} {cy})"/>'
-            )
+                f'stroke-dasharray="',
+                ("dash", i, circ),
+                f'" transform="rotate(-90 {cx} {cy})"/>',
+            ))
 
             # Valeur
-            svg.append(
-                f'<text x="{cx}" y="{cy+4}" text-anchor="middle" '
-                f'font-size="{cfg["font_size"]}" '
+            svg.append((
+                f'<text class="cd-value" data-unit="{i}" x="{cx}" y="{cy+4}" text-anchor="middle" '
+                f'font-size="{cfg.font_size}" '
                 f'font-family="system-ui, -apple-system, sans-serif" '
                 f'font-weight="{number_weight}" '
-                f'fill="{text_color}" dominant-baseline="middle">{val:02d}</text>'
-            )
+                f'fill="{text_color}" dominant-baseline="middle">',
+                ("value", i),
+                '</text>',
+            ))
 
             # Label
             if show_labels:
@@ -138,44 +137,46 @@ def svg_preview(cfg: dict) -> str:
                 )
 
         svg.append("</svg>")
-        return "\n".join(svg)
+        return _flatten(svg)
 
     # -----------------------------
-    # 5) TEMPLATE BASIC (inchangé)
+    # TEMPLATE BASIC (inchangé)
     # -----------------------------
-    main_size = cfg["font_size"]
-    label_size = cfg["basic_label_size"]
-    gap = cfg["basic_gap"]
+    main_size = cfg.font_size
+    label_size = cfg.basic_label_size
+    gap = cfg.basic_gap
     between = 18
 
     char_w = main_size * 0.7
     label_w = label_size * 0.6
 
     total_width = 0
-    for label, val in units:
+    for _ in labels:
         num_w = 2 * char_w
         lab_w = label_w
         bw = max(num_w, lab_w)
         total_width += bw
-    total_width += between * (len(units) - 1)
+    total_width += between * (len(labels) - 1)
 
     center_y = h / 2 + 10
     start_x = (w - total_width) / 2
     x = start_x
 
-    for label, val in units:
+    for i, label in enumerate(labels):
         num_w = 2 * char_w
         lab_w = label_w
         bw = max(num_w, lab_w)
         num_x = x + bw / 2
 
-        svg.append(
-            f'<text x="{num_x}" y="{center_y}" text-anchor="middle" '
+        svg.append((
+            f'<text class="cd-value" data-unit="{i}" x="{num_x}" y="{center_y}" text-anchor="middle" '
             f'font-size="{main_size}" '
             f'font-family="system-ui, -apple-system, sans-serif" '
             f'font-weight="{number_weight}" '
-            f'fill="{text_color}">{val:02d}</text>'
-        )
+            f'fill="{text_color}">',
+            ("value", i),
+            '</text>',
+        ))
 
         if show_labels:
             svg.append(
@@ -183,10 +184,133 @@ def svg_preview(cfg: dict) -> str:
                 f'font-size="{label_size}" '
                 f'font-family="system-ui, -apple-system, sans-serif" '
                 f'font-weight="{label_weight}" '
-                f'fill="{cfg["basic_label_color"]}">{label}</text>'
+                f'fill="{cfg.basic_label_color}">{label}</text>'
             )
 
         x += bw + between
 
     svg.append("</svg>")
-    return "\n".join(svg)
\ No newline at end of file
+    return _flatten(svg)
+
+
+def _flatten(lines):
+    """
+    Lignes (chaînes ou tuples de morceaux) -> morceaux, chaînes fixes
+    consécutives fusionnées.
+    """
+    parts = []
+    for n, line in enumerate(lines):
+        pieces = line if isinstance(line, tuple) else (line,)
+        if n:
+            pieces = ("\n",) + pieces
+        for piece in pieces:
+            if isinstance(piece, str) and parts and isinstance(parts[-1], str):
+                parts[-1] += piece
+            else:
+                parts.append(piece)
+    return tuple(parts)
+
+
+def _units(remaining: int):
+    if remaining <= 0:
+        return 0, 0, 0, 0
+    days, rem = divmod(remaining, 86400)
+    hours, rem = divmod(rem, 3600)
+    minutes, seconds = divmod(rem, 60)
+    return days, hours, minutes, seconds
+
+
+def svg_preview(cfg: CountdownConfig, now: datetime = None) -> str:
+    # -----------------------------
+    # Récupération du temps restant
+    # -----------------------------
+    try:
+        end = datetime.fromisoformat(cfg.target_date)
+    except Exception:
+        end = datetime.utcnow() + timedelta(days=3)
+
+    now = now or datetime.utcnow()
+    values = _units(int((end - now).total_seconds()))
+
+    out = []
+    for part in _skeleton(cfg):
+        if isinstance(part, str):
+            out.append(part)
+        elif part[0] == "value":
+            out.append(f"{values[part[1]]:02d}")
+        else:
+            _, i, circ = part
+            dash = max(0.0, min(values[i] / _UNIT_MAX[i], 1.0)) * circ
+            out.append(f"{dash} {circ - dash}")
+    return "".join(out)
+
+
+# -----------------------------
+# SVG autonome (/c/<id>.svg)
+# -----------------------------
+# Le navigateur décompte lui-même : la réponse ne dépend que de la config,
+# elle peut donc être mise en cache indéfiniment par version de config.
+# Le script ne s'exécute que si le SVG est chargé comme document
+# (<object>, <iframe>, onglet), pas via <img> : le GIF reste là pour ça.
+
+_LIVE_SCRIPT = """<script type="application/ecmascript"><![CDATA[
+(function () {
+  var target = %d;
+  var root = document.documentElement;
+  function units() {
+    var rem = Math.floor((target - Date.now()) / 1000);
+    if (rem <= 0) return [0, 0, 0, 0];
+    var d = Math.floor(rem / 86400); rem %%= 86400;
+    var h = Math.floor(rem / 3600); rem %%= 3600;
+    return [d, h, Math.floor(rem / 60), rem %% 60];
+  }
+  function tick() {
+    var u = units(), i, el, v;
+    var vals = root.querySelectorAll(".cd-value");
+    for (i = 0; i < vals.length; i++) {
+      el = vals[i];
+      v = String(u[+el.getAttribute("data-unit")]);
+      el.textContent = v.length < 2 ? "0" + v : v;
+    }
+    var rings = root.querySelectorAll(".cd-progress");
+    for (i = 0; i < rings.length; i++) {
+      el = rings[i];
+      var circ = +el.getAttribute("data-circ");
+      var r = u[+el.getAttribute("data-unit")] / +el.getAttribute("data-max");
+      var dash = Math.max(0, Math.min(r, 1)) * circ;
+      el.setAttribute("stroke-dasharray", dash + " " + (circ - dash));
+    }
+  }
+  tick();
+  setInterval(tick, 1000);
+})();
+]]></script>"""
+
+
+def svg_live(cfg: CountdownConfig, end: datetime) -> str:
+    """
+    SVG qui décompte côté client jusqu'à `end` (UTC). Corps déterministe :
+    chiffres "--" et anneaux vides jusqu'au premier tick du script.
+    """
+    epoch_ms = int((end - datetime(1970, 1, 1)).total_seconds() * 1000)
+    out = []
+    for part in _skeleton(cfg):
+        if isinstance(part, str):
+            out.append(part)
+        elif part[0] == "value":
+            out.append("--")
+        else:
+            out.append(f"0 {part[2]}")
+    svg = "".join(out)
+    # Script inséré juste avant </svg>
+    return svg[: -len("</svg>")] + (_LIVE_SCRIPT % epoch_ms) + "\n</svg>"
+
+
+def stats() -> dict:
+    info = _skeleton.cache_info()
+    return {
+        "entries": info.currsize,
+        "max_entries": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+    }
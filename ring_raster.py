@@ -0,0 +1,125 @@
+import os
+import math
+import threading
+from functools import lru_cache
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:  # dépendance optionnelle : repli sur les arcs Pillow
+    np = None
+
+
+# ============================
+# ANNEAUX ANALYTIQUES (NumPy)
+# ============================
+# En qualité "auto", les anneaux du template circular sont dessinés avec
+# draw.arc sur une tuile 4x puis réduits (LANCZOS) à chaque patch. Ici la
+# couverture antialiasée d'un anneau se calcule directement à la taille
+# native : distance au centre et angle de chaque pixel sont précalculés
+# une fois par (rayon, épaisseur) ; un arc de progression pour un ratio
+# donné n'est plus qu'un seuil sur la carte d'angles.
+#
+# Couverture d'un pixel = couverture radiale (bords intérieur/extérieur)
+# x couverture angulaire (extrémités de l'arc), chacune approchée par une
+# rampe linéaire d'un pixel autour du bord.
+#
+# RING_RASTER=pillow force l'ancien chemin (NumPy absent : idem).
+
+ENABLED = np is not None and os.environ.get("RING_RASTER", "numpy") != "pillow"
+
+# Masques d'arc mémorisés par anneau (un par valeur affichée : <= 60)
+_MASKS_MAX = 128
+
+
+class RingRaster:
+    """
+    Cartes précalculées pour une tuile carrée de côté 2*radius+1, centre
+    au pixel (radius, radius). Même emprise que les arcs Pillow dessinés
+    dans la boîte (0, 0, 2*radius, 2*radius).
+    """
+
+    def __init__(self, radius: int, thickness: int):
+        self.radius = radius
+        self.thickness = thickness
+        self.side = 2 * radius + 1
+
+        coords = np.arange(self.side, dtype=np.float32) - radius
+        dx = coords[np.newaxis, :]
+        dy = coords[:, np.newaxis]
+        self.dist = np.hypot(dx, dy)
+        # Angle dans le sens horaire depuis midi, dans [0, 2π)
+        self.angle = np.arctan2(dx, -dy) % np.float32(2 * math.pi)
+
+        outer = radius + 0.5
+        self.base = self._radial(outer, thickness)
+        self.glow = self._radial(outer, thickness * 1.8)
+        self.base_mask = self._to_mask(self.base)
+
+        self._lock = threading.Lock()
+        self._masks = {}
+
+    def _radial(self, outer: float, width: float):
+        inner = outer - width
+        cover = np.minimum(outer - self.dist + 0.5, self.dist - inner + 0.5)
+        return np.clip(cover, 0.0, 1.0)
+
+    def _angular(self, ratio: float):
+        if ratio >= 1.0:
+            return None
+        end = np.float32(2 * math.pi * ratio)
+        # Pixels hors de l'arc : rattachés à l'extrémité la plus proche
+        signed = np.where(self.angle > (end + 2 * math.pi) / 2, self.angle - 2 * math.pi, self.angle)
+        cover = np.minimum(signed, end - signed) * np.maximum(self.dist, 1.0) + 0.5
+        return np.clip(cover, 0.0, 1.0)
+
+    @staticmethod
+    def _to_mask(cover) -> Image.Image:
+        return Image.fromarray((cover * 255 + 0.5).astype(np.uint8), "L")
+
+    def masks(self, ratio: float):
+        """
+        (masque glow, masque progression) pour un ratio, (None, None) si
+        ratio <= 0.
+        """
+        key = round(ratio, 6)
+        with self._lock:
+            cached = self._masks.get(key)
+        if cached is not None:
+            return cached
+
+        if ratio <= 0:
+            glow = progress = None
+        else:
+            angular = self._angular(ratio)
+            if angular is None:
+                glow, progress = self.glow, self.base
+            else:
+                glow, progress = self.glow * angular, self.base * angular
+            glow, progress = self._to_mask(glow), self._to_mask(progress)
+        entry = (glow, progress)
+
+        with self._lock:
+            if len(self._masks) >= _MASKS_MAX:
+                self._masks.clear()
+            self._masks[key] = entry
+        return entry
+
+
+@lru_cache(maxsize=32)
+def ring(radius: int, thickness: int) -> RingRaster:
+    """
+    Cartes partagées par toutes les configs de même géométrie.
+    """
+    return RingRaster(radius, thickness)
+
+
+def stats() -> dict:
+    info = ring.cache_info()
+    return {
+        "enabled": ENABLED,
+        "rings": info.currsize,
+        "hits": info.hits,
+        "misses": info.misses,
+    }
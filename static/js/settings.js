@@ -141,22 +141,123 @@ document.addEventListener("DOMContentLoaded", () => {
         );
         params.set("basic_gap", document.getElementById("basic_gap").value);
 
-        // Cache-buster
-        params.set("t", Date.now().toString());
-
         return "/preview.svg?" + params.toString();
     }
 
-    function updatePreview() {
+    // ============================
+    // APERÇU LIVE
+    // ============================
+    // Le SVG n'est redemandé que si les paramètres changent (après une
+    // pause de PREVIEW_DEBOUNCE_MS, la requête précédente étant annulée).
+    // Entre deux, le SVG est inséré dans la page et on ne met à jour que
+    // les chiffres (.cd-value) et les anneaux (.cd-progress) chaque seconde.
+    const PREVIEW_DEBOUNCE_MS = 150;
+    const previewBox = previewImg ? previewImg.parentElement : null;
+    let debounceTimer = null;
+    let inflight = null;
+    let lastURL = null;
+    let liveSvg = null;
+
+    function targetTime() {
+        // Date cible interprétée en UTC, comme côté serveur
+        const dateVal = dateInput.value;
+        if (!dateVal) return null;
+        const t = Date.parse(dateVal + "T" + (timeInput.value || "00:00") + ":00Z");
+        return Number.isNaN(t) ? null : t;
+    }
+
+    function remainingUnits() {
+        const target = targetTime();
+        if (target === null) return null;
+        let rem = Math.floor((target - Date.now()) / 1000);
+        if (rem <= 0) return [0, 0, 0, 0];
+        const days = Math.floor(rem / 86400);
+        rem %= 86400;
+        const hours = Math.floor(rem / 3600);
+        rem %= 3600;
+        return [days, hours, Math.floor(rem / 60), rem % 60];
+    }
+
+    function tick() {
+        if (!liveSvg) return;
+        const units = remainingUnits();
+        if (!units) return;
+
+        liveSvg.querySelectorAll(".cd-value").forEach((el) => {
+            const v = String(units[Number(el.dataset.unit)]).padStart(2, "0");
+            if (el.textContent !== v) el.textContent = v;
+        });
+        liveSvg.querySelectorAll(".cd-progress").forEach((el) => {
+            const circ = Number(el.dataset.circ);
+            const ratio = units[Number(el.dataset.unit)] / Number(el.dataset.max);
+            const dash = Math.max(0, Math.min(ratio, 1)) * circ;
+            el.setAttribute("stroke-dasharray", dash + " " + (circ - dash));
+        });
+    }
+
+    function mountSvg(text) {
+        const doc = new DOMParser().parseFromString(text, "image/svg+xml");
+        const svg = doc.documentElement;
+        if (svg.nodeName !== "svg") return false;
+
+        svg.removeAttribute("width");
+        svg.removeAttribute("height");
+        svg.style.maxWidth = "100%";
+        svg.style.maxHeight = "170px";
+
+        const node = document.importNode(svg, true);
+        if (liveSvg) {
+            liveSvg.replaceWith(node);
+        } else {
+            previewImg.style.display = "none";
+            previewBox.appendChild(node);
+        }
+        liveSvg = node;
+        tick();
+        return true;
+    }
+
+    async function updatePreview() {
         if (!previewImg) return;
-        previewImg.src = buildPreviewURL();
+        const url = buildPreviewURL();
+        if (url === lastURL) return;
+
+        if (!window.fetch || !window.AbortController) {
+            previewImg.src = url;
+            lastURL = url;
+            return;
+        }
+
+        if (inflight) inflight.abort();
+        const ctrl = new AbortController();
+        inflight = ctrl;
+        try {
+            const resp = await fetch(url, { signal: ctrl.signal });
+            if (!resp.ok) return;
+            const text = await resp.text();
+            if (inflight !== ctrl) return;
+            if (mountSvg(text)) lastURL = url;
+        } catch (err) {
+            if (err.name !== "AbortError") {
+                previewImg.src = url;
+            }
+        } finally {
+            if (inflight === ctrl) inflight = null;
+        }
+    }
+
+    function schedulePreview() {
+        clearTimeout(debounceTimer);
+        debounceTimer = setTimeout(updatePreview, PREVIEW_DEBOUNCE_MS);
     }
 
     // Mise à jour live : changement sur n’importe quel champ du formulaire
     form.addEventListener("input", () => {
-        updatePreview();
+        schedulePreview();
     });
 
+    setInterval(tick, 1000);
+
     // Première mise à jour au chargement
     updatePreview();
 });
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+Stockage des configs de countdown.
+
+    FileBackend   : un JSON par countdown dans CONFIG_DIR (historique)
+    SQLiteBackend : une table indexée, journal WAL
+
+    python storage.py migrate --from configs --to countdowns.db
+"""
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+
+# ============================
+# BACKEND FICHIERS
+# ============================
+
+class FileBackend:
+
+    name = "file"
+
+    def __init__(self, config_dir: str):
+        self.config_dir = config_dir
+        os.makedirs(config_dir, exist_ok=True)
+
+    def path(self, cid: str) -> str:
+        return os.path.join(self.config_dir, f"{cid}.json")
+
+    def version(self, cid: str):
+        """
+        Jeton de version (mtime en ns), None si absent. Sert à revalider
+        les caches sans relire la config.
+        """
+        try:
+            return os.stat(self.path(cid)).st_mtime_ns
+        except OSError:
+            return None
+
+    def read(self, cid: str):
+        try:
+            with open(self.path(cid), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def write(self, cid: str, data: dict):
+        with open(self.path(cid), "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def ids(self):
+        for name in os.listdir(self.config_dir):
+            if name.endswith(".json"):
+                yield name[:-5]
+
+    def count(self) -> int:
+        return sum(1 for _ in self.ids())
+
+
+# ============================
+# BACKEND SQLITE (WAL)
+# ============================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS countdowns (
+    id          TEXT PRIMARY KEY,
+    data        TEXT NOT NULL,
+    target_date TEXT,
+    created_at  TEXT NOT NULL,
+    version     INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS countdowns_created ON countdowns (created_at);
+CREATE INDEX IF NOT EXISTS countdowns_target ON countdowns (target_date);
+"""
+
+# Requêtes constantes : sqlite3 garde leurs statements préparés en cache
+# par connexion (cached_statements), on ne les reparse pas à chaque appel.
+_SQL_VERSION = "SELECT version FROM countdowns WHERE id = ?"
+_SQL_READ = "SELECT data FROM countdowns WHERE id = ?"
+_SQL_WRITE = """
+INSERT INTO countdowns (id, data, target_date, created_at, version)
+VALUES (?, ?, ?, ?, 1)
+ON CONFLICT(id) DO UPDATE SET
+    data = excluded.data,
+    target_date = excluded.target_date,
+    version = countdowns.version + 1
+"""
+
+
+class SQLiteBackend:
+
+    name = "sqlite"
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # Une connexion par thread (gunicorn threads = 2) et par process :
+        # avec preload_app, celle du master ne doit pas servir après fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=10, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def version(self, cid: str):
+        row = self._conn().execute(_SQL_VERSION, (cid,)).fetchone()
+        return row[0] if row else None
+
+    def read(self, cid: str):
+        row = self._conn().execute(_SQL_READ, (cid,)).fetchone()
+        if row is None:
+            return None
+        try:
+            data = json.loads(row[0])
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _row(self, cid: str, data: dict, created_at: str = None):
+        return (
+            cid,
+            json.dumps(data, ensure_ascii=False),
+            data.get("target_date"),
+            created_at or datetime.utcnow().isoformat(timespec="seconds"),
+        )
+
+    def write(self, cid: str, data: dict):
+        conn = self._conn()
+        with conn:
+            conn.execute(_SQL_WRITE, self._row(cid, data))
+
+    def write_many(self, items):
+        """
+        Insertion en masse : items = [(cid, data, created_at ou None), ...]
+        """
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                _SQL_WRITE, (self._row(cid, data, created) for cid, data, created in items)
+            )
+
+    def ids(self):
+        for (cid,) in self._conn().execute("SELECT id FROM countdowns ORDER BY created_at"):
+            yield cid
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM countdowns").fetchone()[0]
+
+
+def from_env(config_dir: str):
+    """
+    STORAGE_BACKEND=file (défaut) ou sqlite (SQLITE_PATH, par défaut
+    <config_dir>/countdowns.db).
+    """
+    kind = os.environ.get("STORAGE_BACKEND", "file")
+    if kind == "sqlite":
+        path = os.environ.get("SQLITE_PATH", os.path.join(config_dir, "countdowns.db"))
+        return SQLiteBackend(path)
+    return FileBackend(config_dir)
+
+
+# ============================
+# MIGRATION JSON -> SQLITE
+# ============================
+
+def migrate(config_dir: str, db_path: str, batch: int = 1000) -> int:
+    """
+    Importe tous les <id>.json de config_dir (created_at = mtime du fichier).
+    Ré-exécutable : les ids déjà présents sont mis à jour.
+    """
+    source = FileBackend(config_dir)
+    target = SQLiteBackend(db_path)
+    items = []
+    total = 0
+    for cid in source.ids():
+        data = source.read(cid)
+        if data is None:
+            continue
+        mtime = os.path.getmtime(source.path(cid))
+        items.append((cid, data, datetime.utcfromtimestamp(mtime).isoformat(timespec="seconds")))
+        if len(items) >= batch:
+            target.write_many(items)
+            total += len(items)
+            items = []
+    if items:
+        target.write_many(items)
+        total += len(items)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stockage des countdowns")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    m = sub.add_parser("migrate", help="importe les JSON dans SQLite")
+    m.add_argument("--from", dest="src", required=True, help="dossier des JSON")
+    m.add_argument("--to", dest="dst", required=True, help="fichier SQLite")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "migrate":
+        n = migrate(args.src, args.dst)
+        print(f"{n} countdown(s) importé(s) dans {args.dst}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import time
+import logging
+from datetime import datetime
+
+
+# ============================
+# WARM-UP AU DÉMARRAGE
+# ============================
+# Polices, couches statiques, palettes, tuiles de chiffres et squelettes
+# SVG préparés avant la première requête. Avec preload_app (cf.
+# gunicorn.conf.py), le warm-up tourne dans le master avant le fork : les
+# workers partagent ces pages en copie sur écriture au lieu de payer
+# chacun le démarrage à froid. Sans preload_app, chaque worker se prépare
+# lui-même (hook post_worker_init).
+#
+# WARMUP_IDS="id1,id2" : countdowns chauds, dont on rend en plus le GIF
+# courant (frames partagées du FrameStore, valables une boucle).
+
+log = logging.getLogger(__name__)
+
+WARMUP_IDS = [cid for cid in os.environ.get("WARMUP_IDS", "").replace(" ", "").split(",") if cid]
+
+_report = {}
+
+
+def run(ids=None) -> dict:
+    """
+    Prépare la config par défaut et les countdowns `ids` (WARMUP_IDS par
+    défaut). Renvoie le rapport (aussi exposé par stats()).
+    """
+    import app as web
+    import fonts
+    import glyph_atlas
+    import renderer_gif
+    import renderer_svg
+
+    t0 = time.perf_counter()
+
+    renderer_gif.warm(web.DEFAULT_CONFIG)
+    renderer_svg.svg_preview(web.DEFAULT_CONFIG)
+
+    warmed, missing = [], []
+    for cid in WARMUP_IDS if ids is None else ids:
+        cfg = web.renderable_config(cid)
+        end_time = cfg.end_time if cfg is not None else None
+        if end_time is None:
+            missing.append(cid)
+            continue
+        renderer_gif.warm(cfg)
+        renderer_svg.svg_preview(cfg)
+        now = datetime.utcnow().replace(microsecond=0)
+        renderer_gif.generate_gif(
+            cfg, end_time, now=now, frames_window=web.FRAME_STORE.window((cid, cfg.digest))
+        )
+        warmed.append(cid)
+
+    done = time.perf_counter()
+    _report.update({
+        "pid": os.getpid(),
+        "warm_ms": round((done - t0) * 1000, 1),
+        "ids": warmed,
+        "missing": missing,
+        "fonts": fonts.stats()["faces"],
+        "glyph_tiles": glyph_atlas.ATLAS.stats()["tiles"],
+    })
+    if missing:
+        log.warning("warm-up : countdowns introuvables %s", ", ".join(missing))
+    log.info(
+        "warm-up : %d countdown(s), %d polices, %d tuiles en %.0f ms",
+        len(warmed), _report["fonts"], _report["glyph_tiles"], _report["warm_ms"],
+    )
+    return dict(_report)
+
+
+def mark_ready(boot_ms: float):
+    """
+    Durée totale de démarrage (lecture de la conf gunicorn -> prêt).
+    """
+    _report["ready_ms"] = round(boot_ms, 1)
+
+
+def stats() -> dict:
+    return dict(_report)